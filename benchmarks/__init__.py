@@ -0,0 +1,3 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
@@ -0,0 +1,147 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import shutil
+import tempfile
+import pfDevTools
+
+from . import fixtures
+
+_one_mib: int = 1024 * 1024
+
+
+# -- Classes
+class ReverseSuite:
+    """Bit-reversing a bitstream."""
+
+    params = [1, 4, 16]
+    param_names = ['MiB']
+
+    def setup(self, size):
+        self._folder = tempfile.mkdtemp()
+        rbf_file = fixtures.writeRandomFile(os.path.join(self._folder, 'core.rbf'), size * _one_mib)
+
+        self._command = pfDevTools.Reverse([rbf_file, os.path.join(self._folder, 'core.rbf_r')])
+
+    def teardown(self, size):
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    def time_reverse(self, size):
+        fixtures.quietly(self._command)
+
+
+class ConvertSuite:
+    """Converting the platform image and the author icon."""
+
+    params = ['platform', 'icon']
+    param_names = ['image']
+
+    def setup(self, image):
+        self._folder = tempfile.mkdtemp()
+
+        size = fixtures.platform_image_size if image == 'platform' else fixtures.author_icon_size
+        image_file = fixtures.writeImage(os.path.join(self._folder, 'image.png'), size)
+
+        self._command = pfDevTools.Convert([image_file, os.path.join(self._folder, 'image.bin')])
+
+    def teardown(self, image):
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    def time_convert(self, image):
+        fixtures.quietly(self._command)
+
+
+class PackageSuite:
+    """Packaging a core from its config file and bitstream."""
+
+    params = [4, 16]
+    param_names = ['MiB']
+
+    def setup(self, size):
+        self._folder = tempfile.mkdtemp()
+        config_file = fixtures.writeCoreConfig(os.path.join(self._folder, 'src'))
+        rbf_file = fixtures.writeRandomFile(os.path.join(self._folder, 'core.rbf'), size * _one_mib)
+
+        self._command = pfDevTools.Package([config_file, rbf_file, os.path.join(self._folder, '_build')])
+
+    def teardown(self, size):
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    def time_package(self, size):
+        fixtures.quietly(self._command)
+
+
+class InstallSuite:
+    """Installing a packaged core on an empty volume."""
+
+    # -- Installing again on the same volume is a no-op so each sample needs a fresh volume from setup().
+    number = 1
+    repeat = 10
+    warmup_time = 0
+
+    def setup_cache(self):
+        folder = os.path.abspath('install')
+        config_file = fixtures.writeCoreConfig(os.path.join(folder, 'src'))
+        rbf_file = fixtures.writeRandomFile(os.path.join(folder, 'core.rbf'), 4 * _one_mib)
+
+        command = pfDevTools.Package([config_file, rbf_file, folder])
+        fixtures.quietly(command)
+
+        return os.path.join(folder, command.packagedFilename())
+
+    def setup(self, zip_filename):
+        self._volume_path = tempfile.mkdtemp()
+
+        self._command = pfDevTools.Install([zip_filename, self._volume_path])
+
+    def teardown(self, zip_filename):
+        shutil.rmtree(self._volume_path, ignore_errors=True)
+
+    def time_install(self, zip_filename):
+        fixtures.quietly(self._command)
+
+
+class DeleteSuite:
+    """Deleting a core from a populated SD card."""
+
+    # -- Deleting modifies the volume so each sample needs a freshly populated one from setup().
+    number = 1
+    repeat = 10
+    warmup_time = 0
+
+    params = [10, 100]
+    param_names = ['cores']
+
+    def setup(self, nb_of_cores):
+        self._volume_path = tempfile.mkdtemp()
+        core_names = fixtures.writeSDCard(self._volume_path, nb_of_cores, _one_mib)
+
+        self._command = pfDevTools.Delete([core_names[nb_of_cores // 2], self._volume_path])
+
+    def teardown(self, nb_of_cores):
+        shutil.rmtree(self._volume_path, ignore_errors=True)
+
+    def time_delete(self, nb_of_cores):
+        fixtures.quietly(self._command)
+
+
+class QfsSuite:
+    """Updating a large Quartus project file."""
+
+    params = [10000, 100000]
+    param_names = ['assignments']
+
+    def setup(self, nb_of_assignments):
+        self._folder = tempfile.mkdtemp()
+        qsf_file = fixtures.writeQsf(os.path.join(self._folder, 'in.qsf'), nb_of_assignments)
+        verilog_files = [f'src/fpga/core/module_{index}.sv' for index in range(500)]
+
+        self._command = pfDevTools.Qfs([qsf_file, os.path.join(self._folder, 'out.qsf'), 'cpus=8'] + verilog_files)
+
+    def teardown(self, nb_of_assignments):
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+    def time_qfs(self, nb_of_assignments):
+        fixtures.quietly(self._command)
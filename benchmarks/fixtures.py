@@ -0,0 +1,137 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import io
+import os
+import json
+import random
+import contextlib
+
+from typing import List
+
+# -- Fixtures are generated from a fixed seed so that every run, on every commit, benchmarks the same data.
+_seed: int = 0x9F0C
+
+# -- The size of the platform image and author icon the Pocket expects.
+platform_image_size = (521, 165)
+author_icon_size = (36, 36)
+
+
+def randomBytes(size: int) -> bytes:
+    return random.Random(_seed).randbytes(size)
+
+
+def writeRandomFile(path: str, size: int) -> str:
+    with open(path, 'wb') as out_file:
+        out_file.write(randomBytes(size))
+
+    return path
+
+
+def writeImage(path: str, size) -> str:
+    from PIL import Image
+
+    # -- Greyscale noise stored as RGB, which is what the Pocket's image converter gets given in practice.
+    width, height = size
+    Image.frombytes('L', size, randomBytes(width * height)).convert('RGB').save(path)
+
+    return path
+
+
+def writeCoreConfig(folder: str, short_name: str = 'bench') -> str:
+    os.makedirs(folder, exist_ok=True)
+
+    writeImage(os.path.join(folder, 'image.png'), platform_image_size)
+    writeImage(os.path.join(folder, 'icon.png'), author_icon_size)
+
+    with open(os.path.join(folder, 'info.txt'), 'w') as out_file:
+        out_file.write('A core used to benchmark pf.\n' * 64)
+
+    config_file = os.path.join(folder, 'pf-core.toml')
+    with open(config_file, 'w') as out_file:
+        out_file.write(f'''[Platform]
+name = "Benchmark"
+image = "image.png"
+short_name = "{short_name}"
+category = "Test"
+description = "A core used to benchmark pf."
+info = "info.txt"
+
+[Build]
+version = "1.0.0"
+
+[Author]
+name = "pf"
+icon = "icon.png"
+url = "https://github.com/DidierMalenfant/pfDevTools"
+
+[Video]
+width = 400
+height = 360
+aspect_w = 10
+aspect_h = 9
+rotation = 0
+mirror = 0
+''')
+
+    return config_file
+
+
+def writeQsf(path: str, nb_of_assignments: int) -> str:
+    with open(path, 'w') as out_file:
+        out_file.write('set_global_assignment -name FAMILY "Cyclone V"\n')
+        out_file.write('set_global_assignment -name DEVICE 5CEBA4F23C8\n')
+
+        for index in range(nb_of_assignments):
+            out_file.write(f'set_location_assignment PIN_{index % 1000} -to signal_{index}\n')
+
+        out_file.write('\n# Additions made by pf command\n')
+        out_file.write('set_global_assignment -name VERILOG_FILE old.v\n')
+        out_file.write('# End of additions made by pf command\n')
+
+        for index in range(nb_of_assignments):
+            out_file.write(f'set_instance_assignment -name IO_STANDARD "3.3-V LVTTL" -to signal_{index}\n')
+
+    return path
+
+
+def writeSDCard(volume_path: str, nb_of_cores: int, bitstream_size: int) -> List[str]:
+    # -- Returns the name of the core folders, laid out the way the Pocket expects them.
+    bitstream = randomBytes(bitstream_size)
+    core_names: List[str] = []
+
+    for index in range(nb_of_cores):
+        short_name = f'core{index}'
+        core_name = f'pf.{short_name}'
+        core_names.append(core_name)
+
+        core_folder = os.path.join(volume_path, 'Cores', core_name)
+        os.makedirs(core_folder, exist_ok=True)
+
+        for filename in ['audio.json', 'core.json', 'data.json', 'input.json', 'interact.json', 'variants.json', 'video.json']:
+            with open(os.path.join(core_folder, filename), 'w') as out_file:
+                json.dump({filename[:-5]: {'magic': 'APF_VER_1'}}, out_file)
+
+        with open(os.path.join(core_folder, f'{short_name}.rbf_r'), 'wb') as out_file:
+            out_file.write(bitstream)
+
+        images_folder = os.path.join(volume_path, 'Platforms', '_images')
+        os.makedirs(images_folder, exist_ok=True)
+
+        with open(os.path.join(volume_path, 'Platforms', f'{short_name}.json'), 'w') as out_file:
+            json.dump({'platform': {'name': short_name, 'category': 'Test'}}, out_file)
+
+        with open(os.path.join(images_folder, f'{short_name}.bin'), 'wb') as out_file:
+            out_file.write(bitstream[:platform_image_size[0] * platform_image_size[1] * 2])
+
+    for folder in ['Assets', 'Saves', 'Settings', 'Memories']:
+        os.makedirs(os.path.join(volume_path, folder), exist_ok=True)
+
+    return core_names
+
+
+def quietly(command) -> None:
+    # -- Commands print progress which would only add noise to the timings.
+    with contextlib.redirect_stdout(io.StringIO()):
+        command.run()
@@ -0,0 +1,12 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+
+# -- These run in a fresh interpreter each time so they measure cold imports, which is what every pf invocation pays.
+def timeraw_import_pfDevTools():
+    return 'import pfDevTools'
+
+
+def timeraw_import_pf_command():
+    return 'from pfDevTools.pfCommand.pfCommand import pfCommand'
@@ -0,0 +1,77 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import re
+import sys
+import subprocess
+
+from typing import Dict
+from typing import List
+
+# -- Checks that starting pf stays fast, unlike the asv benchmarks this fails instead of just recording a time:
+# --    python -m benchmarks.startup <budget=ms>
+
+# -- What every pf invocation imports before it even parses its arguments.
+_statement: str = 'import pfDevTools.pfCommand.__main__'
+
+# -- Only the commands which need these should import them.
+_heavy_modules: List[str] = ['SCons', 'PIL', 'semver', 'zipfile', 'tarfile', 'concurrent.futures', 'distutils',
+                             'multiprocessing', 'asyncio', 'ssl', 'http.client', 'urllib.request']
+
+# -- Cumulative import time of pfDevTools allowed at startup, in milliseconds.
+_budget_in_ms: float = 200.0
+
+# -- Import times are noisy so the best of a few runs is used.
+_nb_of_runs: int = 3
+
+
+def importTimes(statement: str) -> Dict[str, int]:
+    # -- Returns the cumulative import time, in microseconds, of each module imported by statement.
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'Running \'{statement}\' failed:\n{result.stderr}')
+
+    times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)', line)
+        if match is not None:
+            times[match.group(4)] = int(match.group(2))
+
+    return times
+
+
+def heavyModules(times: Dict[str, int]) -> List[str]:
+    return sorted(name for name in times if any(name == module or name.startswith(module + '.') for module in _heavy_modules))
+
+
+def main(arguments: List[str]) -> int:
+    budget_in_ms = _budget_in_ms
+    for argument in arguments:
+        if argument.startswith('budget='):
+            budget_in_ms = float(argument[7:])
+        else:
+            print('usage: python -m benchmarks.startup <budget=ms>')
+            return 2
+
+    runs = [importTimes(_statement) for _ in range(_nb_of_runs)]
+
+    # -- pfDevTools and pfDevTools.pfCommand are imported by pfDevTools.pfCommand.__main__ so their times are part of its own.
+    startup_time_in_ms = min(times.get('pfDevTools.pfCommand.__main__', 0) for times in runs) / 1000
+
+    succeeded = True
+
+    heavy_modules = heavyModules(runs[0])
+    if len(heavy_modules) != 0:
+        print(f'pf imports {", ".join(heavy_modules)} at startup.')
+        succeeded = False
+
+    print(f'pf takes {startup_time_in_ms:.1f}ms to import at startup, the budget is {budget_in_ms:.1f}ms.')
+    if startup_time_in_ms > budget_in_ms:
+        succeeded = False
+
+    return 0 if succeeded else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,193 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import re
+import json
+
+from typing import Dict
+from typing import List
+from typing import Optional
+
+
+# -- Classes
+class BuildMetrics:
+    """Extract timing and resource metrics from the reports of a Quartus compile."""
+
+    def __init__(self, output_files_folder: str, revision_name: str = 'pf_core'):
+        """Constructor based on the Quartus output_files folder and project revision name."""
+
+        self._output_files_folder: str = output_files_folder
+        self._revision_name: str = revision_name
+
+    def _reportPath(self, extension: str) -> str:
+        return os.path.join(self._output_files_folder, f'{self._revision_name}.{extension}')
+
+    def _readLines(self, extension: str) -> List[str]:
+        path = self._reportPath(extension)
+        if not os.path.exists(path):
+            return []
+
+        with open(path, 'r', errors='replace') as in_file:
+            return in_file.read().splitlines()
+
+    def _readSummary(self, extension: str) -> Dict[str, str]:
+        summary: Dict[str, str] = {}
+
+        for line in self._readLines(extension):
+            separator = line.find(' : ')
+            if separator < 0:
+                continue
+
+            summary[line[:separator].strip()] = line[separator + 3:].strip()
+
+        return summary
+
+    @classmethod
+    def _readReportTable(cls, lines: List[str], title: str) -> List[List[str]]:
+        # -- Quartus report tables look like '; Title ;' followed by a header row and data rows, all delimited by '+---' lines.
+        rows: List[List[str]] = []
+        in_table = False
+        border_count = 0
+
+        for line in lines:
+            if not in_table:
+                if line.startswith('; ') and line.strip('; ').strip() == title:
+                    in_table = True
+                    border_count = 0
+
+                continue
+
+            if line.startswith('+'):
+                border_count += 1
+                if border_count == 3:
+                    in_table = False
+
+                continue
+
+            if border_count == 2 and line.startswith(';'):
+                rows.append([cell.strip() for cell in line.strip().strip(';').split(';')])
+
+        return rows
+
+    @classmethod
+    def _parseUsage(cls, value: Optional[str]) -> Optional[Dict[str, int]]:
+        # -- Values look like '1,234 / 18,480 ( 7 % )', '2345' or 'N/A'.
+        if value is None:
+            return None
+
+        numbers = re.findall(r'[0-9][0-9,]*', value.split('(')[0])
+        if len(numbers) == 0:
+            return None
+
+        usage: Dict[str, int] = {'used': int(numbers[0].replace(',', ''))}
+        if len(numbers) > 1:
+            usage['available'] = int(numbers[1].replace(',', ''))
+
+        return usage
+
+    @classmethod
+    def _parseElapsedTime(cls, value: str) -> Optional[int]:
+        components = value.split(':')
+        if len(components) != 3:
+            return None
+
+        try:
+            return (int(components[0]) * 3600) + (int(components[1]) * 60) + int(components[2])
+        except ValueError:
+            return None
+
+    def resourceUsage(self, extension: str) -> Dict[str, Optional[Dict[str, int]]]:
+        summary = self._readSummary(extension)
+
+        return {'alms': BuildMetrics._parseUsage(summary.get('Logic utilization (in ALMs)')),
+                'registers': BuildMetrics._parseUsage(summary.get('Total registers')),
+                'block_memory_bits': BuildMetrics._parseUsage(summary.get('Total block memory bits')),
+                'ram_blocks': BuildMetrics._parseUsage(summary.get('Total RAM Blocks')),
+                'dsp_blocks': BuildMetrics._parseUsage(summary.get('Total DSP Blocks')),
+                'pins': BuildMetrics._parseUsage(summary.get('Total pins'))}
+
+    def slacks(self) -> List[Dict]:
+        # -- The timing analyzer summary is a list of 'Type : ...', 'Slack : ...' and 'TNS : ...' blocks.
+        slacks: List[Dict] = []
+        current: Dict = None
+
+        for line in self._readLines('sta.summary'):
+            separator = line.find(':')
+            if separator < 0:
+                continue
+
+            key = line[:separator].strip()
+            value = line[separator + 1:].strip()
+
+            if key == 'Type':
+                current = {'type': value}
+                slacks.append(current)
+            elif current is not None and key in ('Slack', 'TNS'):
+                try:
+                    current[key.lower()] = float(value)
+                except ValueError:
+                    pass
+
+        return slacks
+
+    def worstSlack(self) -> Optional[float]:
+        values = [slack['slack'] for slack in self.slacks() if 'slack' in slack]
+        if len(values) == 0:
+            return None
+
+        return min(values)
+
+    def fmaxPerClock(self) -> Dict[str, float]:
+        # -- Fmax is not part of the timing summary so we look for the worst value of each clock across all the timing models.
+        fmax: Dict[str, float] = {}
+
+        lines = self._readLines('sta.rpt')
+        for line in lines:
+            if not line.startswith('; ') or not line.strip('; ').strip().endswith('Model Fmax Summary'):
+                continue
+
+            model = line.strip('; ').strip()
+            for row in BuildMetrics._readReportTable(lines, model):
+                if len(row) < 3 or not row[0].endswith('MHz'):
+                    continue
+
+                try:
+                    value = float(row[0].split()[0])
+                except ValueError:
+                    continue
+
+                clock_name = row[2]
+                if clock_name not in fmax or value < fmax[clock_name]:
+                    fmax[clock_name] = value
+
+        return fmax
+
+    def stageTimes(self) -> Dict[str, int]:
+        stage_times: Dict[str, int] = {}
+
+        for row in BuildMetrics._readReportTable(self._readLines('flow.rpt'), 'Flow Elapsed Time'):
+            if len(row) < 2:
+                continue
+
+            elapsed_time = BuildMetrics._parseElapsedTime(row[1])
+            if elapsed_time is not None:
+                stage_times[row[0]] = elapsed_time
+
+        return stage_times
+
+    def metrics(self, wall_time: Optional[float] = None) -> Dict:
+        return {'revision': self._revision_name,
+                'fmax_mhz': self.fmaxPerClock(),
+                'worst_slack_ns': self.worstSlack(),
+                'slacks': self.slacks(),
+                'resources': {'synthesis': self.resourceUsage('map.summary'),
+                              'fitter': self.resourceUsage('fit.summary')},
+                'stage_times_in_seconds': self.stageTimes(),
+                'wall_time_in_seconds': None if wall_time is None else round(wall_time, 3)}
+
+    def writeTo(self, output_filename: str, wall_time: Optional[float] = None) -> None:
+        with open(output_filename, 'w') as out_file:
+            json.dump(self.metrics(wall_time), out_file, indent=2)
+            out_file.write('\n')
@@ -0,0 +1,296 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import io
+import os
+import hmac
+import gzip
+import json
+import zlib
+import socket
+import shutil
+import hashlib
+import tarfile
+
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+
+# -- Classes
+class CompileFarm:
+    """Sends Quartus compiles to a pool of pf compile servers and gets their output files back."""
+
+    # -- Bumped whenever clients and servers can no longer understand each other.
+    protocol_version: int = 2
+
+    default_port: int = 5797
+
+    # -- Generated or rebuilt by Quartus, so never sent to the servers.
+    excluded_folders: List[str] = ['db', 'incremental_db', 'output_files']
+
+    # -- Anything bigger is refused, so that one request can't run the other side out of memory.
+    max_payload_size: int = 256 * 1024 * 1024
+    max_unpacked_size: int = 1024 * 1024 * 1024
+
+    # -- Shared by clients and servers, every request has to be signed with it.
+    token_variable: str = 'PF_COMPILE_TOKEN'
+
+    _connection_timeout: float = 5.0
+
+    def __init__(self, servers: str):
+        """Constructor based on a comma separated list of host:port servers."""
+
+        self._servers: List[Tuple[str, int]] = []
+
+        for server in servers.split(','):
+            server = server.strip()
+            if len(server) == 0:
+                continue
+
+            host, _, port = server.partition(':')
+            try:
+                self._servers.append((host, int(port) if len(port) != 0 else CompileFarm.default_port))
+            except ValueError:
+                raise RuntimeError(f'Invalid compile server \'{server}\'. Servers should be given as host:port.')
+
+        if len(self._servers) == 0:
+            raise RuntimeError('The remote toolchain needs a list of compile servers, for example from PF_COMPILE_SERVERS.')
+
+        self._token: str = CompileFarm.token()
+
+        self._cpus_per_job: int = None
+
+    @classmethod
+    def token(cls) -> str:
+        token = os.environ.get(CompileFarm.token_variable, None)
+        if token is None or len(token) == 0:
+            raise RuntimeError(f'Compile servers and their clients need a shared secret in {CompileFarm.token_variable}.')
+
+        return token
+
+    @classmethod
+    def _signature(cls, message: Dict, token: str) -> str:
+        content = json.dumps({name: value for name, value in message.items() if name != 'auth'}, sort_keys=True)
+        return hmac.new(token.encode('utf-8'), content.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    @classmethod
+    def sign(cls, message: Dict, token: str) -> Dict:
+        return dict(message, auth=CompileFarm._signature(message, token))
+
+    @classmethod
+    def isSigned(cls, message: Dict, token: str) -> bool:
+        # -- Compile requests contain the hash of the sources sent afterwards so those are covered by the signature too.
+        auth = message.get('auth', None)
+        return isinstance(auth, str) and hmac.compare_digest(auth, CompileFarm._signature(message, token))
+
+    @classmethod
+    def sendMessage(cls, connection: socket.socket, message: Dict, payload: bytes = None) -> None:
+        # -- Messages are one line of JSON, optionally followed by a payload whose size is given in the message.
+        if payload is not None:
+            message = dict(message, size=len(payload))
+
+        connection.sendall(json.dumps(message).encode('utf-8') + b'\n' + (payload or b''))
+
+    @classmethod
+    def readMessage(cls, in_file) -> Optional[Dict]:
+        line = in_file.readline()
+        if len(line) == 0:
+            return None
+
+        return json.loads(line)
+
+    @classmethod
+    def readPayload(cls, in_file, message: Dict) -> bytes:
+        size = message.get('size', 0)
+        if not isinstance(size, int) or size < 0 or size > CompileFarm.max_payload_size:
+            raise RuntimeError(f'Refusing a payload of {size} bytes.')
+
+        payload = in_file.read(size)
+        if len(payload) != size:
+            raise RuntimeError('Connection to the compile server was lost.')
+
+        return payload
+
+    @classmethod
+    def packFolder(cls, folder: str, excluded: List[str] = []) -> bytes:
+        # -- Files are added in a fixed order, without timestamps or owners, so the same sources always give the same tarball.
+        data = io.BytesIO()
+
+        with tarfile.open(fileobj=data, mode='w', format=tarfile.PAX_FORMAT) as tar_file:
+            for root, dirs, files in os.walk(folder):
+                if root == folder:
+                    dirs[:] = [name for name in dirs if name not in excluded]
+
+                dirs.sort()
+
+                for file in sorted(files):
+                    path = os.path.join(root, file)
+                    relative_path = os.path.relpath(path, folder).replace(os.sep, '/')
+                    if root == folder and file in excluded:
+                        continue
+
+                    info = tar_file.gettarinfo(path, relative_path)
+                    if not info.isfile():
+                        continue
+
+                    info.mtime = 0
+                    info.uid = info.gid = 0
+                    info.uname = info.gname = ''
+                    info.mode = 0o755 if info.mode & 0o100 else 0o644
+
+                    with open(path, 'rb') as in_file:
+                        tar_file.addfile(info, in_file)
+
+        return data.getvalue()
+
+    @classmethod
+    def jobHash(cls, command: str, tarball: bytes) -> str:
+        sha256 = hashlib.sha256()
+        sha256.update(f'{CompileFarm.protocol_version}\0{command}\0'.encode('utf-8'))
+        sha256.update(tarball)
+
+        return sha256.hexdigest()
+
+    @classmethod
+    def compress(cls, tarball: bytes) -> bytes:
+        return gzip.compress(tarball, compresslevel=6, mtime=0)
+
+    @classmethod
+    def decompress(cls, compressed_tarball: bytes) -> bytes:
+        # -- Unlike gzip.decompress(), this stops as soon as the data gets bigger than what we accept.
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        try:
+            tarball = decompressor.decompress(compressed_tarball, CompileFarm.max_unpacked_size + 1)
+        except zlib.error as e:
+            raise RuntimeError(f'Invalid compressed data ({str(e)}).')
+
+        if len(tarball) > CompileFarm.max_unpacked_size:
+            raise RuntimeError(f'Refusing data bigger than {CompileFarm.max_unpacked_size} bytes once uncompressed.')
+
+        if not decompressor.eof:
+            raise RuntimeError('Compressed data is truncated.')
+
+        return tarball
+
+    @classmethod
+    def unpack(cls, compressed_tarball: bytes, folder: str) -> None:
+        os.makedirs(folder, exist_ok=True)
+
+        with tarfile.open(fileobj=io.BytesIO(CompileFarm.decompress(compressed_tarball)), mode='r:') as tar_file:
+            # -- The data filter refuses absolute paths, links outside the folder and the like. Older Pythons check paths by hand.
+            if hasattr(tarfile, 'data_filter'):
+                tar_file.extractall(folder, filter='data')
+            else:
+                root = os.path.realpath(folder)
+                for member in tar_file.getmembers():
+                    if not os.path.realpath(os.path.join(root, member.name)).startswith(root + os.sep) or member.issym() or member.islnk():
+                        raise RuntimeError(f'Invalid file \'{member.name}\' in compile job.')
+
+                tar_file.extractall(folder)
+
+    def _request(self, server: Tuple[str, int], message: Dict):
+        connection = socket.create_connection(server, timeout=CompileFarm._connection_timeout)
+
+        try:
+            CompileFarm.sendMessage(connection, message)
+        except OSError:
+            connection.close()
+            raise
+
+        return connection
+
+    def _status(self, server: Tuple[str, int]) -> Optional[Dict]:
+        try:
+            connection = self._request(server, CompileFarm.sign({'type': 'status', 'protocol': CompileFarm.protocol_version}, self._token))
+            with connection, connection.makefile('rb') as in_file:
+                status = CompileFarm.readMessage(in_file)
+        except (OSError, ValueError):
+            return None
+
+        if status is not None and status.get('type', None) == 'error':
+            print(f'Compile server {server[0]}:{server[1]}: {status.get("message", "")}')
+            return None
+
+        if status is None or status.get('protocol', None) != CompileFarm.protocol_version:
+            return None
+
+        return status
+
+    def _statuses(self) -> List[Tuple[Tuple[str, int], Dict]]:
+        statuses = [(server, self._status(server)) for server in self._servers]
+        return [(server, status) for server, status in statuses if status is not None]
+
+    def cpusPerJob(self) -> int:
+        # -- The project file is written before a server is picked so it gets the number of CPUs every server can give a job.
+        if self._cpus_per_job is None:
+            statuses = self._statuses()
+            self._cpus_per_job = min((status['cpus_per_job'] for server, status in statuses), default=1)
+
+        return self._cpus_per_job
+
+    def _pickServer(self) -> Tuple[str, int]:
+        statuses = self._statuses()
+        if len(statuses) == 0:
+            raise RuntimeError('None of the compile servers can be reached.')
+
+        # -- The server with the most free workers wins, then the one with the most free cores and memory.
+        def score(item):
+            server, status = item
+            return (status['workers'] - status['busy'] - status['queued'], status['free_cpus'], status['free_memory'])
+
+        return max(statuses, key=score)[0]
+
+    def compile(self, command: str, build_folder: str, quiet: bool, line_handler: Callable[[str], None] = None) -> List[str]:
+        tarball = CompileFarm.packFolder(build_folder, CompileFarm.excluded_folders)
+        job_hash = CompileFarm.jobHash(command, tarball)
+
+        server = self._pickServer()
+        print(f'Sending compile job {job_hash[:12]} to {server[0]}:{server[1]}.')
+
+        output: List[str] = []
+
+        connection = self._request(server, CompileFarm.sign({'type': 'compile', 'protocol': CompileFarm.protocol_version, 'hash': job_hash, 'command': command}, self._token))
+        with connection, connection.makefile('rb') as in_file:
+            # -- Compiles take a long time, the server sends log lines as they come.
+            connection.settimeout(None)
+
+            while True:
+                message = CompileFarm.readMessage(in_file)
+                if message is None:
+                    raise RuntimeError('Connection to the compile server was lost.')
+
+                message_type = message.get('type', None)
+                if message_type == 'send':
+                    CompileFarm.sendMessage(connection, {'type': 'source'}, CompileFarm.compress(tarball))
+                elif message_type == 'log':
+                    output.append(message['line'])
+                    if not quiet:
+                        (line_handler or print)(message['line'])
+                elif message_type == 'result':
+                    result = CompileFarm.readPayload(in_file, message)
+                    break
+                elif message_type == 'error':
+                    raise RuntimeError(message['message'])
+                else:
+                    raise RuntimeError(f'Unexpected message \'{message_type}\' from the compile server.')
+
+        output_folder = os.path.join(build_folder, 'output_files')
+        if os.path.exists(output_folder):
+            shutil.rmtree(output_folder)
+
+        # -- Output files come back even if the compile failed since they contain Quartus' reports.
+        if len(result) != 0:
+            CompileFarm.unpack(result, output_folder)
+
+        if message.get('cached', False):
+            print(f'Compile job {job_hash[:12]} was already done, using cached results.')
+
+        if message['exit_code'] != 0:
+            raise RuntimeError(f'Compile job {job_hash[:12]} failed on {server[0]}:{server[1]}.')
+
+        return output
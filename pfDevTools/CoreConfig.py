@@ -5,9 +5,14 @@
 import os
 
 from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
 from sys import platform
+from dataclasses import dataclass
 
 from .Exceptions import ArgumentError
+from .Toolchain import Toolchain
 
 try:
     import tomllib
@@ -16,14 +21,72 @@ except ModuleNotFoundError:
 
 
 # -- Classes
+@dataclass(frozen=True, slots=True)
+class CoreConfigValues:
+    """All the values read from a core config file, once validated."""
+
+    platform_name: str
+    platform_image: str
+    platform_short_name: str
+    platform_category: str
+    platform_description: str
+    platform_info_file: Optional[str]
+    build_version: str
+    build_toolchain: Optional[str]
+    build_toolchain_prefix: Optional[str]
+    author_name: str
+    author_icon: str
+    author_url: str
+    video_width: int
+    video_height: int
+    video_aspect_w: int
+    video_aspect_h: int
+    video_rotation: int
+    video_mirror: int
+    video_scaler_modes: List[Dict]
+    definitions: Dict[str, Dict]
+
+
 class CoreConfig:
     """A class for openFPGA core configurations"""
 
+    # -- Field name, section, parameter name, type and whether the parameter is required.
+    _fields: List[Tuple[str, str, str, type, bool]] = [('platform_name', 'Platform', 'name', str, True),
+                                                       ('platform_image', 'Platform', 'image', str, True),
+                                                       ('platform_short_name', 'Platform', 'short_name', str, True),
+                                                       ('platform_category', 'Platform', 'category', str, True),
+                                                       ('platform_description', 'Platform', 'description', str, True),
+                                                       ('platform_info_file', 'Platform', 'info', str, False),
+                                                       ('build_version', 'Build', 'version', str, True),
+                                                       ('build_toolchain', 'Build', 'toolchain', str, False),
+                                                       ('build_toolchain_prefix', 'Build', 'toolchain_prefix', str, False),
+                                                       ('author_name', 'Author', 'name', str, True),
+                                                       ('author_icon', 'Author', 'icon', str, True),
+                                                       ('author_url', 'Author', 'url', str, True),
+                                                       ('video_width', 'Video', 'width', int, True),
+                                                       ('video_height', 'Video', 'height', int, True),
+                                                       ('video_aspect_w', 'Video', 'aspect_w', int, True),
+                                                       ('video_aspect_h', 'Video', 'aspect_h', int, True),
+                                                       ('video_rotation', 'Video', 'rotation', int, True),
+                                                       ('video_mirror', 'Video', 'mirror', int, True)]
+
+    # -- Sections whose other parameters are passed as is to the matching APF definition file, for example data slots
+    # -- or controllers. See https://www.analogue.co/developer/docs/core-definition-files for what they can contain.
+    _definition_sections: Dict[str, str] = {'Audio': 'audio',
+                                            'Data': 'data',
+                                            'Input': 'input',
+                                            'Variants': 'variants',
+                                            'Interact': 'interact',
+                                            'Video': 'video'}
+
+    # -- Parsed config files are remembered along with the modification time and size they had. They are keyed on the path
+    # -- as given too because the file paths in the config are relative to it.
+    _parsed_configs: Dict[Tuple[str, str], Tuple[int, int, CoreConfigValues]] = {}
+
     def __init__(self, config_filename: str):
         """Constructor based on config file path."""
 
         self.config_filename: str = config_filename
-        self._platform_short_name = None
 
         components = os.path.splitext(self.config_filename)
         if len(components) != 2 or components[1] != '.toml':
@@ -34,85 +97,167 @@ class CoreConfig:
 
         self.config_file_folder = os.path.dirname(self.config_filename)
 
-        with open(self.config_filename, mode="rb") as fp:
-            self._config = tomllib.load(fp)
+        self.values: CoreConfigValues = CoreConfig._valuesFor(self.config_filename)
 
-    def _getConfigParam(self, section_name: str, param_name: str) -> str:
-        section: Dict = self._config.get(section_name, None)
+    @classmethod
+    def _valuesFor(cls, config_filename: str) -> CoreConfigValues:
+        path = os.path.abspath(config_filename)
+        info = os.stat(path)
 
-        if section is None:
-            raise RuntimeError(f'Can\'t find section named {section_name} in config file.')
+        key = (path, config_filename)
+        cached = CoreConfig._parsed_configs.get(key, None)
+        if cached is not None and cached[0] == info.st_mtime_ns and cached[1] == info.st_size:
+            return cached[2]
 
-        param: str = section.get(param_name, None)
-        if param is None:
-            raise RuntimeError(f'Can\'t find parameter {param_name} in sectior {section_name} in config file.')
+        with open(path, mode="rb") as fp:
+            config = tomllib.load(fp)
 
-        return param
+        values = CoreConfig._validate(config, config_filename)
+        CoreConfig._parsed_configs[key] = (info.st_mtime_ns, info.st_size, values)
 
-    def platformName(self) -> str:
-        return self._getConfigParam('Platform', 'name')
+        return values
 
-    def platformImage(self) -> str:
-        return os.path.join(self.config_file_folder, self._getConfigParam('Platform', 'image'))
+    @classmethod
+    def _validate(cls, config: Dict, config_filename: str) -> CoreConfigValues:
+        # -- Every problem found is reported at once instead of one at a time.
+        errors: List[str] = []
+        values: Dict[str, object] = {}
 
-    def platformShortName(self) -> str:
-        if self._platform_short_name is None:
-            self._platform_short_name = self._getConfigParam('Platform', 'short_name')
+        sections: Dict[str, Dict] = {}
+        for section_name, section in config.items():
+            if isinstance(section, dict):
+                sections[section_name] = section
+            elif section_name in CoreConfig._definition_sections or any(section_name == field[1] for field in CoreConfig._fields):
+                errors.append(f'{section_name} in config file should be a section.')
+
+        # -- Several scaler modes can be given instead of the single one described by the parameters in the Video section.
+        scaler_modes = sections.get('Video', {}).get('scaler_modes', None)
+        if scaler_modes is not None and (not isinstance(scaler_modes, list) or not all(isinstance(mode, dict) for mode in scaler_modes)):
+            errors.append('Parameter scaler_modes in section Video should be an array of tables.')
+
+        for field_name, section_name, param_name, param_type, required in CoreConfig._fields:
+            values[field_name] = None
+
+            if section_name == 'Video' and scaler_modes is not None:
+                required = False
+
+            section: Dict = sections.get(section_name, None)
+            if section is None:
+                if required:
+                    errors.append(f'Can\'t find section named {section_name} in config file.')
+
+                continue
+
+            param = section.get(param_name, None)
+            if param is None:
+                if required:
+                    errors.append(f'Can\'t find parameter {param_name} in section {section_name} in config file.')
+
+                continue
+
+            # -- bool is a subclass of int but true or false are not valid values for integer parameters.
+            if not isinstance(param, param_type) or isinstance(param, bool):
+                errors.append(f'Parameter {param_name} in section {section_name} should be {"a string" if param_type is str else "an integer"}.')
+                continue
 
-            for c in self._platform_short_name:
+            values[field_name] = param
+
+        short_name = values['platform_short_name']
+        if short_name is not None:
+            for c in short_name:
                 if (c.isalnum() is False) or c.isupper():
-                    raise RuntimeError('Platform short name should be lower-case and can only contain a-z, 0-9 or _.')
+                    errors.append('Platform short name should be lower-case and can only contain a-z, 0-9 or _.')
+                    break
+
+        toolchain = values['build_toolchain']
+        if toolchain is not None and toolchain not in Toolchain.names():
+            errors.append(f'Parameter toolchain in section Build should be one of {", ".join(Toolchain.names())}.')
+
+        if len(errors) != 0:
+            # -- A missing section would otherwise be reported once for each of its parameters.
+            raise RuntimeError(f'Invalid config file \'{config_filename}\':\n' + '\n'.join(f'   {error}' for error in dict.fromkeys(errors)))
+
+        config_file_folder = os.path.dirname(config_filename)
+        for field_name in ['platform_image', 'author_icon']:
+            values[field_name] = os.path.join(config_file_folder, values[field_name])
+
+        if values['platform_info_file'] is not None:
+            values['platform_info_file'] = os.path.expandvars(os.path.join(config_file_folder, values['platform_info_file']))
+
+        if scaler_modes is None:
+            scaler_modes = [{'width': values['video_width'],
+                             'height': values['video_height'],
+                             'aspect_w': values['video_aspect_w'],
+                             'aspect_h': values['video_aspect_h'],
+                             'rotation': values['video_rotation'],
+                             'mirror': values['video_mirror']}]
+
+        values['video_scaler_modes'] = scaler_modes
+
+        used_params = {(section_name, param_name) for _, section_name, param_name, _, _ in CoreConfig._fields} | {('Video', 'scaler_modes')}
+        values['definitions'] = {}
+        for section_name, definition_name in CoreConfig._definition_sections.items():
+            section = sections.get(section_name, {})
+            values['definitions'][definition_name] = {name: value for name, value in section.items() if (section_name, name) not in used_params}
 
-        return self._platform_short_name
+        return CoreConfigValues(**values)
+
+    def platformName(self) -> str:
+        return self.values.platform_name
+
+    def platformImage(self) -> str:
+        return self.values.platform_image
+
+    def platformShortName(self) -> str:
+        return self.values.platform_short_name
 
     def platformCategory(self) -> str:
-        return self._getConfigParam('Platform', 'category')
+        return self.values.platform_category
 
     def platformDescription(self) -> str:
-        return self._getConfigParam('Platform', 'description')
+        return self.values.platform_description
 
     def platformInfoFile(self) -> str:
-        platform_config = self._config.get('Platform', None)
-        if platform_config is not None:
-            info_file = platform_config.get('info', None)
+        return self.values.platform_info_file
 
-            if info_file is not None:
-                return os.path.expandvars(os.path.join(self.config_file_folder, info_file))
+    def buildVersion(self) -> str:
+        return self.values.build_version
 
-        return None
+    def buildToolchain(self) -> str:
+        return self.values.build_toolchain
 
-    def buildVersion(self) -> str:
-        return self._getConfigParam('Build', 'version')
+    def buildToolchainPrefix(self) -> str:
+        return self.values.build_toolchain_prefix
 
     def authorName(self) -> str:
-        return self._getConfigParam('Author', 'name')
+        return self.values.author_name
 
     def authorIcon(self) -> str:
-        return os.path.join(self.config_file_folder, self._getConfigParam('Author', 'icon'))
+        return self.values.author_icon
 
     def authorURL(self) -> str:
-        return self._getConfigParam('Author', 'url')
+        return self.values.author_url
 
-    def videoWidth(self) -> str:
-        return self._getConfigParam('Video', 'width')
+    def videoWidth(self) -> int:
+        return self.values.video_width
 
-    def videoHeight(self) -> str:
-        return self._getConfigParam('Video', 'height')
+    def videoHeight(self) -> int:
+        return self.values.video_height
 
-    def videoAspectRatioWidth(self) -> str:
-        return self._getConfigParam('Video', 'aspect_w')
+    def videoAspectRatioWidth(self) -> int:
+        return self.values.video_aspect_w
 
-    def videoAspectRatioHeight(self) -> str:
-        return self._getConfigParam('Video', 'aspect_h')
+    def videoAspectRatioHeight(self) -> int:
+        return self.values.video_aspect_h
 
-    def videoRotation(self) -> str:
-        return self._getConfigParam('Video', 'rotation')
+    def videoRotation(self) -> int:
+        return self.values.video_rotation
 
-    def videoMirror(self) -> str:
-        return self._getConfigParam('Video', 'mirror')
+    def videoMirror(self) -> int:
+        return self.values.video_mirror
 
     def fullPlatformName(self) -> str:
-        return f'{self.authorName()}.{self.platformShortName()}'
+        return f'{self.values.author_name}.{self.values.platform_short_name}'
 
     @classmethod
     def coreInstallVolumePath(cls) -> str:
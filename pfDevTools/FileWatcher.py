@@ -0,0 +1,202 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import sys
+import time
+import ctypes
+import select
+import struct
+import ctypes.util
+
+from typing import Dict
+from typing import List
+from typing import Set
+from typing import Tuple
+
+
+# -- Classes
+class _PollingBackend:
+    """Finds changes by comparing modification times and sizes between scans."""
+
+    def __init__(self, watcher):
+        self._watcher = watcher
+        self._snapshot: Dict[str, Tuple[int, int]] = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot: Dict[str, Tuple[int, int]] = {}
+
+        for path in self._watcher.watchedFiles():
+            try:
+                info = os.stat(path)
+                snapshot[path] = (info.st_mtime_ns, info.st_size)
+            except OSError:
+                pass
+
+        return snapshot
+
+    def waitForChanges(self, timeout: float) -> Set[str]:
+        deadline = time.monotonic() + timeout
+
+        while True:
+            snapshot = self._scan()
+            changes = {path for path in set(snapshot.keys()) | set(self._snapshot.keys()) if snapshot.get(path) != self._snapshot.get(path)}
+            self._snapshot = snapshot
+
+            remaining = deadline - time.monotonic()
+            if len(changes) != 0 or remaining <= 0:
+                return changes
+
+            time.sleep(min(self._watcher.polling_interval, remaining))
+
+    def refresh(self) -> None:
+        self._snapshot = self._scan()
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifyBackend:
+    """Gets notified of changes by the Linux kernel."""
+
+    _IN_MODIFY = 0x00000002
+    _IN_ATTRIB = 0x00000004
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_FROM = 0x00000040
+    _IN_MOVED_TO = 0x00000080
+    _IN_CREATE = 0x00000100
+    _IN_DELETE = 0x00000200
+    _IN_ISDIR = 0x40000000
+    _IN_NONBLOCK = 0x00000800
+    _IN_CLOEXEC = 0x00080000
+
+    _event_header = struct.Struct('iIII')
+
+    def __init__(self, watcher):
+        self._watcher = watcher
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd: int = self._libc.inotify_init1(_InotifyBackend._IN_NONBLOCK | _InotifyBackend._IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'Cannot initialize inotify.')
+
+        self._folders: Dict[int, str] = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        mask = _InotifyBackend._IN_MODIFY | _InotifyBackend._IN_ATTRIB | _InotifyBackend._IN_CLOSE_WRITE | _InotifyBackend._IN_MOVED_FROM | _InotifyBackend._IN_MOVED_TO | _InotifyBackend._IN_CREATE | _InotifyBackend._IN_DELETE
+
+        watched_folders = set(self._folders.values())
+        for folder in self._watcher.watchedFolders():
+            if folder in watched_folders:
+                continue
+
+            watch_descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), mask)
+            if watch_descriptor >= 0:
+                self._folders[watch_descriptor] = folder
+
+    def waitForChanges(self, timeout: float) -> Set[str]:
+        changes: Set[str] = set()
+
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if len(readable) == 0:
+            return changes
+
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return changes
+
+        new_folders = False
+        offset = 0
+        while offset + _InotifyBackend._event_header.size <= len(data):
+            watch_descriptor, mask, cookie, name_length = _InotifyBackend._event_header.unpack_from(data, offset)
+            offset += _InotifyBackend._event_header.size
+
+            name = data[offset:offset + name_length].rstrip(b'\0')
+            offset += name_length
+
+            folder = self._folders.get(watch_descriptor, None)
+            if folder is None or len(name) == 0:
+                continue
+
+            if mask & _InotifyBackend._IN_ISDIR:
+                new_folders = True
+                continue
+
+            path = os.path.join(folder, os.fsdecode(name))
+            if self._watcher.isWatched(path):
+                changes.add(path)
+
+        if new_folders:
+            self.refresh()
+
+        return changes
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class FileWatcher:
+    """Watch a set of files and folders for changes, using inotify on Linux and polling everywhere else."""
+
+    def __init__(self, folders: List[str], extensions: List[str], files: List[str], excluded_folders: List[str] = []):
+        """Watch files with given extensions in folders (recursively) as well as individual files."""
+
+        self._folders: List[str] = [os.path.abspath(folder) for folder in folders]
+        self._excluded_folders: Set[str] = {os.path.abspath(folder) for folder in excluded_folders}
+        self._extensions: List[str] = extensions
+        self._files: Set[str] = {os.path.abspath(file) for file in files}
+        self.polling_interval: float = 0.5
+
+        self._backend = None
+        if sys.platform.startswith('linux') and os.environ.get('PF_WATCH_POLLING', None) is None:
+            try:
+                self._backend = _InotifyBackend(self)
+            except (OSError, AttributeError):
+                self._backend = None
+
+        if self._backend is None:
+            self._backend = _PollingBackend(self)
+
+    def isWatched(self, path: str) -> bool:
+        return path in self._files or (os.path.splitext(path)[1] in self._extensions and any(path.startswith(folder + os.sep) for folder in self._folders))
+
+    def _walk(self, root_folder: str):
+        for root, dirs, files in os.walk(root_folder):
+            dirs[:] = [folder for folder in dirs if not folder.startswith('.') and os.path.join(root, folder) not in self._excluded_folders]
+            yield root, files
+
+    def watchedFolders(self) -> List[str]:
+        folders: Set[str] = {os.path.dirname(file) for file in self._files}
+
+        for root_folder in self._folders:
+            for root, files in self._walk(root_folder):
+                folders.add(root)
+
+        return sorted(folders)
+
+    def watchedFiles(self) -> List[str]:
+        files: Set[str] = set(self._files)
+
+        for root_folder in self._folders:
+            for root, filenames in self._walk(root_folder):
+                for filename in filenames:
+                    if os.path.splitext(filename)[1] in self._extensions:
+                        files.add(os.path.join(root, filename))
+
+        return sorted(files)
+
+    def setFiles(self, files: List[str]) -> None:
+        self._files = {os.path.abspath(file) for file in files}
+        self._backend.refresh()
+
+    def usesInotify(self) -> bool:
+        return isinstance(self._backend, _InotifyBackend)
+
+    def waitForChanges(self, timeout: float) -> Set[str]:
+        return self._backend.waitForChanges(timeout)
+
+    def close(self) -> None:
+        self._backend.close()
@@ -2,19 +2,28 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import os
+import json
+import signal
+import hashlib
 import subprocess
 import pfDevTools.Utils
+import pfDevTools.Paths
 
 from typing import List
 from typing import Dict
-from semver import Version
+from typing import Optional
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from semver import Version
 
 
 class Git:
     """Utility methods for git repos."""
 
-    def __init__(self, url: str):
-        """Setup access to the git repo at url."""
+    def __init__(self, url: str, timeout_in_seconds: Optional[float] = None):
+        """Setup access to the git repo at url, optionally giving up on git commands which take longer than a timeout."""
 
         if pfDevTools.Utils.commandExists('git') is False:
             raise RuntimeError('You must have git installed on your machine to continue.')
@@ -26,18 +35,29 @@ class Git:
         self.branches = None
         self.head_branch = None
         self.latest_version = None
+        self.remote_info = None
+        self.timeout_in_seconds = timeout_in_seconds
 
-    def git(self, arguments: str, folder: str = None):
-        commands = ['git'] + arguments.split()
-
-        commands.append(self.url.replace('https://', 'https://anonymous:@'))
-
-        if folder is not None:
-            commands.append(folder)
+    def _anonymousURL(self) -> str:
+        return self.url.replace('https://', 'https://anonymous:@')
 
+    def _runGit(self, commands: List[str]) -> bytes:
         try:
-            process = subprocess.Popen(commands, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, stderr = process.communicate()
+            # -- git runs helpers like git-remote-https in their own processes so, when it can time out, it gets its own
+            # -- process group so that all of them can be killed.
+            can_time_out = self.timeout_in_seconds is not None and os.name == 'posix'
+            process = subprocess.Popen(commands, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=can_time_out)
+            try:
+                stdout, stderr = process.communicate(timeout=self.timeout_in_seconds)
+            except subprocess.TimeoutExpired:
+                # -- For example when the network is down and git is stuck trying to reach the remote.
+                if can_time_out:
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+
+                process.communicate()
+                raise RuntimeError(f'Error running git: timed out after {self.timeout_in_seconds} seconds.')
 
             if process.returncode != 0:
                 if str(stdout).startswith('b"usage: git'):
@@ -56,8 +76,7 @@ class Git:
                     else:
                         raise RuntimeError('Error running git: ' + error)
 
-            # -- Output is bracketed with b'' when converted from bytes.
-            return str(stdout)[2:-1]
+            return stdout
         except RuntimeError:
             raise
         except SyntaxError:
@@ -65,13 +84,87 @@ class Git:
         except Exception as e:
             raise RuntimeError('Error running git: ' + str(e))
 
+    def git(self, arguments: str, folder: str = None):
+        commands = ['git'] + arguments.split()
+
+        commands.append(self._anonymousURL())
+
+        if folder is not None:
+            commands.append(folder)
+
+        # -- Output is bracketed with b'' when converted from bytes.
+        return str(self._runGit(commands))[2:-1]
+
+    def gitInMirror(self, mirror_folder: str, arguments: List[str]) -> bytes:
+        return self._runGit(['git', f'--git-dir={mirror_folder}'] + arguments)
+
+    @classmethod
+    def _remoteInfoTimeToLive(cls) -> int:
+        # -- PF_GIT_CACHE_TTL is in seconds, 0 disables the cache.
+        try:
+            return int(os.environ.get('PF_GIT_CACHE_TTL', 60 * 60))
+        except ValueError:
+            return 60 * 60
+
+    def _remoteInfoCacheFile(self) -> str:
+        url_hash = hashlib.sha1(self.url.encode('utf-8')).hexdigest()
+        return os.path.join(pfDevTools.Paths.cacheFolder(), 'ls-remote', f'{url_hash}.json')
+
+    def _fetchRemoteInfo(self) -> Dict:
+        # -- Without a ref pattern, --symref gives us the head branch along with all the refs in one round trip.
+        output = self._runGit(['git', 'ls-remote', '--symref', self._anonymousURL()]).decode('utf-8')
+
+        head_branch = None
+        refs: Dict[str, str] = {}
+        for line in output.splitlines():
+            components = line.split('\t')
+            if len(components) != 2:
+                continue
+
+            if components[1] == 'HEAD':
+                if components[0].startswith('ref: refs/heads/'):
+                    head_branch = components[0][16:]
+
+                continue
+
+            # -- Peeled tags would be duplicates of the tags themselves.
+            if components[1].startswith('refs/') and not components[1].endswith('^{}'):
+                refs[components[1][5:]] = components[0]
+
+        return {'head_branch': head_branch, 'refs': refs}
+
+    def _remoteInfo(self) -> Dict:
+        if self.remote_info is None:
+            cache_file = self._remoteInfoCacheFile()
+            time_to_live = Git._remoteInfoTimeToLive()
+
+            if time_to_live > 0 and not pfDevTools.Utils.fileOlderThan(cache_file, time_in_seconds=time_to_live):
+                try:
+                    with open(cache_file, 'r') as in_file:
+                        self.remote_info = json.load(in_file)
+                except (OSError, ValueError):
+                    self.remote_info = None
+
+            if self.remote_info is None:
+                self.remote_info = self._fetchRemoteInfo()
+
+                if time_to_live > 0:
+                    try:
+                        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+
+                        temp_file = f'{cache_file}.{os.getpid()}'
+                        with open(temp_file, 'w') as out_file:
+                            json.dump(self.remote_info, out_file)
+
+                        os.replace(temp_file, cache_file)
+                    except OSError:
+                        pass
+
+        return self.remote_info
+
     def listRefs(self) -> Dict[str, str]:
         if self.refs is None:
-            self.refs = {}
-            for ref in self.git('ls-remote --refs').split('\\n'):
-                refs_index = ref.find('refs/')
-                if refs_index >= 0:
-                    self.refs[ref[refs_index + 5:]] = ref[:40]
+            self.refs = self._remoteInfo()['refs']
 
         return self.refs
 
@@ -87,27 +180,31 @@ class Git:
 
     def getHeadBranch(self) -> str:
         if self.head_branch is None:
-            for line in self.git('remote show').split('\\n'):
-                if line.startswith('  HEAD branch:'):
-                    self.head_branch = line[15:]
+            self.head_branch = self._remoteInfo()['head_branch']
 
             if self.head_branch is None:
                 raise RuntimeError('Cannot find head branch for \'' + self.url + '\'.')
 
         return self.head_branch
 
-    def listTags(self) -> List[str]:
+    def _tagsMap(self) -> Dict[str, str]:
         if self.tags is None:
-            self.tags = []
-            for ref in self.listRefs().keys():
+            self.tags = {}
+            refs = self.listRefs()
+            for ref in refs.keys():
                 if ref.startswith('tags/'):
                     tag = ref[5:]
                     if not tag.startswith('@'):
-                        self.tags.append(tag)
+                        self.tags[tag] = refs[ref]
 
         return self.tags
 
-    def listTagVersions(self) -> List[Version]:
+    def listTags(self) -> List[str]:
+        return list(self._tagsMap().keys())
+
+    def listTagVersions(self) -> List['Version']:
+        from semver import Version
+
         if self.tag_versions is None:
             self.tag_versions = []
 
@@ -124,7 +221,7 @@ class Git:
 
         return self.tag_versions
 
-    def getLatestVersion(self) -> Version:
+    def getLatestVersion(self) -> 'Version':
         if self.latest_version is None:
             all_versions = self.listTagVersions()
 
@@ -140,11 +237,7 @@ class Git:
         return name in self.listBranches()
 
     def isATag(self, name: str) -> bool:
-        for tag in self.listTags():
-            if tag == name:
-                return True
-
-        return False
+        return name in self._tagsMap()
 
     def cloneIn(self, folder: str, branch: str = None):
         command_line: str = 'clone --quiet --depth 1'
@@ -152,3 +245,11 @@ class Git:
             command_line += f' --branch {branch}'
 
         self.git(command_line, folder)
+
+    def mirrorIn(self, folder: str):
+        self.git('clone --quiet --bare', folder)
+
+    def fetchInMirror(self, mirror_folder: str):
+        self.gitInMirror(mirror_folder, ['fetch', '--quiet', '--prune', '--tags',
+                                         self._anonymousURL(),
+                                         '+refs/heads/*:refs/heads/*'])
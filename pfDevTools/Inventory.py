@@ -0,0 +1,182 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import json
+import hashlib
+import contextlib
+import pfDevTools.Paths
+
+from typing import Dict
+from typing import List
+from typing import Optional
+
+
+# -- Classes
+class Inventory:
+    """The cores and platforms installed on a volume, scanned without walking the whole volume."""
+
+    # -- Bumped whenever what is stored in the cache changes.
+    _cache_version: int = 3
+
+    def __init__(self, volume_path: str):
+        """Constructor based on the path of the volume to scan."""
+
+        self._volume_path: str = volume_path
+
+        self.cores: Dict[str, Dict] = {}
+        self.platforms: Dict[str, Dict] = {}
+
+    def _cacheFile(self) -> str:
+        path_hash = hashlib.sha1(os.path.abspath(self._volume_path).encode('utf-8')).hexdigest()
+        return os.path.join(pfDevTools.Paths.cacheFolder(), 'inventory', f'{path_hash}.json')
+
+    def _readCache(self) -> Dict:
+        try:
+            with open(self._cacheFile(), 'r') as in_file:
+                cache = json.load(in_file)
+
+            if cache.get('version', None) == Inventory._cache_version:
+                return cache
+        except (OSError, ValueError, AttributeError):
+            pass
+
+        return {'version': Inventory._cache_version, 'cores': {'folders': {}, 'cores': {}}, 'platforms': {}}
+
+    def _writeCache(self, cache: Dict) -> None:
+        cache_file = self._cacheFile()
+
+        with contextlib.suppress(OSError):
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+
+            temp_file = f'{cache_file}.{os.getpid()}'
+            with open(temp_file, 'w') as out_file:
+                json.dump(cache, out_file)
+
+            os.replace(temp_file, cache_file)
+
+    @classmethod
+    def _isIgnored(cls, name: str) -> bool:
+        # -- Hidden files, including the ones macOS adds to FAT volumes.
+        return name.startswith('.')
+
+    @classmethod
+    def _readJson(cls, path: str) -> Optional[Dict]:
+        try:
+            with open(path, 'r') as in_file:
+                content = json.load(in_file)
+        except (OSError, ValueError):
+            return None
+
+        return content if isinstance(content, dict) else None
+
+    @classmethod
+    def _readCoreInfo(cls, core_file: str) -> Dict:
+        definition = Inventory._readJson(core_file) or {}
+        core = definition.get('core', {}) if isinstance(definition.get('core', None), dict) else {}
+        metadata = core.get('metadata', {}) if isinstance(core.get('metadata', None), dict) else {}
+        cores = core.get('cores', []) if isinstance(core.get('cores', None), list) else []
+
+        platform_ids = metadata.get('platform_ids', [])
+
+        return {'version': metadata.get('version', None),
+                'date': metadata.get('date_release', None),
+                'platform_ids': platform_ids if isinstance(platform_ids, list) else [],
+                'bitstreams': [entry['filename'] for entry in cores if isinstance(entry, dict) and 'filename' in entry]}
+
+    @classmethod
+    def _readPlatformInfo(cls, platform_file: str) -> Dict:
+        definition = Inventory._readJson(platform_file) or {}
+        platform = definition.get('platform', {}) if isinstance(definition.get('platform', None), dict) else {}
+
+        return {'name': platform.get('name', None),
+                'category': platform.get('category', None)}
+
+    @classmethod
+    def _fileKeys(cls, core_folder: str, names: List[str]) -> List[Optional[List[int]]]:
+        keys: List[Optional[List[int]]] = []
+        for name in names:
+            try:
+                info = os.stat(os.path.join(core_folder, name))
+                keys.append([info.st_mtime_ns, info.st_size])
+            except OSError:
+                keys.append(None)
+
+        return keys
+
+    def _scanCores(self, cached_cores: Dict) -> Dict:
+        cores_folder = os.path.join(self._volume_path, 'Cores')
+
+        if not os.path.isdir(cores_folder):
+            return {'folders': {}, 'cores': {}}
+
+        folders: Dict[str, int] = {}
+        for entry in os.scandir(cores_folder):
+            if not Inventory._isIgnored(entry.name) and entry.is_dir():
+                folders[entry.name] = entry.stat().st_mtime_ns
+
+        cores: Dict[str, Dict] = {}
+        for name, folder_key in folders.items():
+            core_folder = os.path.join(cores_folder, name)
+            cached = cached_cores['cores'].get(name, None)
+
+            # -- Adding or removing files changes the core's folder but overwriting core.json or a bitstream, for example
+            # -- when copied by hand, doesn't so they are checked too. Nothing else in the core's folder is looked at.
+            if cached_cores['folders'].get(name, None) == folder_key:
+                if cached is None:
+                    continue
+
+                if cached['key'] == Inventory._fileKeys(core_folder, ['core.json'] + cached['info']['bitstreams']):
+                    cores[name] = cached
+                    continue
+
+            if not os.path.isfile(os.path.join(core_folder, 'core.json')):
+                continue
+
+            info = Inventory._readCoreInfo(os.path.join(core_folder, 'core.json'))
+            key = Inventory._fileKeys(core_folder, ['core.json'] + info['bitstreams'])
+            cores[name] = {'key': key, 'info': info, 'bitstream_size': sum(file_key[1] for file_key in key[1:] if file_key is not None)}
+
+        return {'folders': folders, 'cores': cores}
+
+    def _scanPlatforms(self, cached_platforms: Dict[str, Dict]) -> Dict[str, Dict]:
+        platforms: Dict[str, Dict] = {}
+        platforms_folder = os.path.join(self._volume_path, 'Platforms')
+
+        if not os.path.isdir(platforms_folder):
+            return platforms
+
+        for entry in os.scandir(platforms_folder):
+            if Inventory._isIgnored(entry.name) or not entry.name.endswith('.json') or not entry.is_file():
+                continue
+
+            platform_id = entry.name[:-5]
+            info = entry.stat()
+
+            key = [info.st_mtime_ns, info.st_size]
+            cached = cached_platforms.get(platform_id, None)
+            if cached is not None and cached['key'] == key:
+                platforms[platform_id] = cached
+            else:
+                platforms[platform_id] = {'key': key, 'info': Inventory._readPlatformInfo(entry.path)}
+
+        return platforms
+
+    def scan(self) -> None:
+        if not os.path.exists(self._volume_path):
+            raise RuntimeError(f'Volume {self._volume_path} is not mounted.')
+
+        cache = self._readCache()
+
+        scanned_cores = self._scanCores(cache['cores'])
+        scanned_platforms = self._scanPlatforms(cache['platforms'])
+
+        if scanned_cores != cache['cores'] or scanned_platforms != cache['platforms']:
+            self._writeCache({'version': Inventory._cache_version, 'cores': scanned_cores, 'platforms': scanned_platforms})
+
+        self.cores = {name: dict(core['info'], bitstream_size=core['bitstream_size']) for name, core in scanned_cores['cores'].items()}
+        self.platforms = {platform_id: platform['info'] for platform_id, platform in scanned_platforms.items()}
+
+    def coresUsingPlatform(self, platform_id: str) -> List[str]:
+        return sorted(name for name, core in self.cores.items() if platform_id in core['platform_ids'])
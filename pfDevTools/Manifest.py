@@ -0,0 +1,132 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import json
+import hashlib
+
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+
+# -- Classes
+class Manifest:
+    """The SHA-256 hash and size of every file in a packaged core, along with a hash for the whole build."""
+
+    # -- Bumped if the format of manifest files ever changes in a way older versions can't read.
+    _format_version: int = 1
+
+    # -- Large reads keep the number of round trips down when hashing files on USB mass storage.
+    _read_buffer_size: int = 1024 * 1024
+
+    def __init__(self, core_name: str, version: str, files: Dict[str, Tuple[str, int]]):
+        """Constructor based on the core's full platform name, its version and the hash and size of each of its files."""
+
+        self.core_name: str = core_name
+        self.version: str = version
+
+        # -- Paths are relative to the root of the volume the core is installed on and always use forward slashes.
+        self.files: Dict[str, Tuple[str, int]] = files
+
+    @classmethod
+    def hashFile(cls, path: str) -> Tuple[str, int]:
+        sha256 = hashlib.sha256()
+        size = 0
+
+        with open(path, 'rb', buffering=0) as in_file:
+            buffer = bytearray(Manifest._read_buffer_size)
+            view = memoryview(buffer)
+
+            while True:
+                nb_of_bytes_read = in_file.readinto(buffer)
+                if nb_of_bytes_read == 0:
+                    break
+
+                sha256.update(view[:nb_of_bytes_read])
+                size += nb_of_bytes_read
+
+        return sha256.hexdigest(), size
+
+    @classmethod
+    def manifestPath(cls, core_name: str) -> str:
+        return f'Cores/{core_name}/manifest.json'
+
+    @classmethod
+    def fromFolder(cls, root_folder: str, core_name: str, version: str) -> 'Manifest':
+        manifest_path = Manifest.manifestPath(core_name)
+        files: Dict[str, Tuple[str, int]] = {}
+
+        for root, dirs, filenames in os.walk(root_folder):
+            for filename in filenames:
+                full_path = os.path.join(root, filename)
+                relative_path = os.path.relpath(full_path, root_folder).replace(os.sep, '/')
+                if relative_path == manifest_path:
+                    continue
+
+                files[relative_path] = Manifest.hashFile(full_path)
+
+        return Manifest(core_name, version, files)
+
+    def buildHash(self) -> str:
+        # -- Hashing the sorted list of files means the build hash doesn't depend on the order the files were found in.
+        sha256 = hashlib.sha256()
+
+        for path in sorted(self.files.keys()):
+            file_hash, size = self.files[path]
+            sha256.update(f'{path}\0{file_hash}\0{size}\n'.encode('utf-8'))
+
+        return sha256.hexdigest()
+
+    def toDict(self) -> Dict:
+        return {'format': Manifest._format_version,
+                'core': self.core_name,
+                'version': self.version,
+                'build_hash': self.buildHash(),
+                'files': {path: {'sha256': file_hash, 'size': size} for path, (file_hash, size) in sorted(self.files.items())}}
+
+    def writeTo(self, path: str) -> None:
+        with open(path, 'w') as out_file:
+            out_file.write(json.dumps(self.toDict(), indent=2) + '\n')
+
+    @classmethod
+    def fromDict(cls, content: Dict) -> Optional['Manifest']:
+        try:
+            if content['format'] != Manifest._format_version:
+                return None
+
+            files = {path: (info['sha256'], int(info['size'])) for path, info in content['files'].items()}
+            return Manifest(content['core'], content['version'], files)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return None
+
+    @classmethod
+    def fromBytes(cls, data: bytes) -> Optional['Manifest']:
+        try:
+            return Manifest.fromDict(json.loads(data))
+        except ValueError:
+            return None
+
+    @classmethod
+    def readFrom(cls, path: str) -> Optional['Manifest']:
+        # -- Returns None if there is no manifest or if it can't be read, which callers treat as out of date.
+        try:
+            with open(path, 'rb') as in_file:
+                return Manifest.fromBytes(in_file.read())
+        except OSError:
+            return None
+
+    @classmethod
+    def fromZip(cls, zip_file) -> Optional['Manifest']:
+        # -- zip_file is an open zipfile.ZipFile.
+        for name in zip_file.namelist():
+            components = name.split('/')
+            if len(components) == 3 and components[0] == 'Cores' and components[2] == 'manifest.json':
+                return Manifest.fromBytes(zip_file.read(name))
+
+        return None
+
+    @classmethod
+    def installedOn(cls, volume_path: str, core_name: str) -> Optional['Manifest']:
+        return Manifest.readFrom(os.path.join(volume_path, *Manifest.manifestPath(core_name).split('/')))
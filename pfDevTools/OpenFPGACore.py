@@ -3,21 +3,84 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import os
-import sys
+import time
 import shutil
+import threading
 import pfDevTools
 
+from typing import Callable
+from typing import Dict
 from typing import List
 from pathlib import Path
-from distutils.dir_util import copy_tree
 
 
 # -- Classes
+class _Prefetch:
+    """A slow setup step, like a download, started in the background as soon as the build is configured."""
+
+    def __init__(self, name: str, function: Callable[[], None]):
+        self._name: str = name
+        self._thread = threading.Thread(target=self._run, args=(function,), daemon=True)
+        self._thread.start()
+
+    def _run(self, function: Callable[[], None]) -> None:
+        # -- Errors are not reported here, the action waiting for this step does it again and reports them properly.
+        try:
+            with pfDevTools.Profiler.span(f'prefetch {self._name}'):
+                function()
+        except (Exception, SystemExit):
+            pass
+
+    def isRunning(self) -> bool:
+        return self._thread.is_alive()
+
+    def wait(self) -> None:
+        self._thread.join()
+
+
 class OpenFPGACore:
     """A SCons action to build on openFPGA core."""
 
+    # -- Steps started in the background by build(), keyed on what they fetch.
+    _prefetches: Dict[str, _Prefetch] = {}
+
     @classmethod
-    def _cloneRepo(cls, target, source, env):
+    def _startPrefetch(cls, key: str, name: str, function: Callable[[], None]) -> None:
+        # -- A step still running from an earlier build in the same process, for example in the pf daemon, is not started again.
+        prefetch = OpenFPGACore._prefetches.get(key, None)
+        if prefetch is None or not prefetch.isRunning():
+            OpenFPGACore._prefetches[key] = _Prefetch(name, function)
+
+    @classmethod
+    def _waitForPrefetch(cls, key: str) -> bool:
+        # -- Returns False if nothing was started in the background for key.
+        prefetch = OpenFPGACore._prefetches.pop(key, None)
+        if prefetch is None:
+            return False
+
+        prefetch.wait()
+        return True
+
+    @classmethod
+    def _prefetchTemplate(cls, env, prefetched_folder: str) -> None:
+        if os.path.exists(prefetched_folder):
+            pfDevTools.Utils.deleteFolder(prefetched_folder, force_delete=True)
+
+        pfDevTools.Clone(OpenFPGACore._cloneCommandLine(env, prefetched_folder)).run()
+
+    @classmethod
+    def _isBuilding(cls) -> bool:
+        import SCons.Script
+        import SCons.Script.Main
+
+        # -- Cleaning, dry runs or SCons not run from an SConstruct file never need anything fetched.
+        if isinstance(SCons.Script.Main.OptionsParser, SCons.Script.Main.FakeOptionParser):
+            return False
+
+        return not (SCons.Script.GetOption('clean') or SCons.Script.GetOption('no_exec') or SCons.Script.GetOption('help'))
+
+    @classmethod
+    def _cloneCommandLine(cls, env, repo_folder: str) -> List[str]:
         command_line: List[str] = []
 
         url = env.get('PF_CORE_TEMPLATE_REPO_URL', None)
@@ -28,13 +91,33 @@ class OpenFPGACore:
         if tag is not None:
             command_line.append(f'tag={tag}')
 
-        repo_folder = env['PF_CORE_TEMPLATE_FOLDER']
         command_line.append(repo_folder)
+        return command_line
 
-        if os.path.exists(repo_folder):
-            pfDevTools.Utils.deleteFolder(repo_folder, force_delete=True)
+    @classmethod
+    def _prefetchedFolder(cls, repo_folder: str) -> str:
+        return repo_folder + '.prefetch'
+
+    @classmethod
+    def _cloneRepo(cls, target, source, env):
+        repo_folder = env['PF_CORE_TEMPLATE_FOLDER']
+        prefetched_folder = OpenFPGACore._prefetchedFolder(repo_folder)
 
-        pfDevTools.Clone(command_line).run()
+        was_prefetched = OpenFPGACore._waitForPrefetch(prefetched_folder)
+
+        with pfDevTools.Profiler.span('clone core template'):
+            if os.path.exists(repo_folder):
+                pfDevTools.Utils.deleteFolder(repo_folder, force_delete=True)
+
+            # -- Moving the template cloned in the background into place is the only thing left to do, unless that clone failed.
+            if was_prefetched and os.path.exists(os.path.join(prefetched_folder, 'src', 'fpga', 'ap_core.qsf')):
+                os.rename(prefetched_folder, repo_folder)
+                return
+
+            if os.path.exists(prefetched_folder):
+                pfDevTools.Utils.deleteFolder(prefetched_folder, force_delete=True)
+
+            pfDevTools.Clone(OpenFPGACore._cloneCommandLine(env, repo_folder)).run()
 
     @classmethod
     def _copyRepo(cls, target, source, env):
@@ -46,105 +129,109 @@ class OpenFPGACore:
 
         print(f'Copying core template repo from \'{src_folder}\'.')
 
-        if os.path.exists(dest_folder):
-            pfDevTools.Utils.deleteFolder(dest_folder, force_delete=True)
+        with pfDevTools.Profiler.span('copy core template'):
+            if os.path.exists(dest_folder):
+                pfDevTools.Utils.deleteFolder(dest_folder, force_delete=True)
 
-        copy_tree(src_folder, dest_folder)
+            shutil.copytree(src_folder, dest_folder, dirs_exist_ok=True)
 
     @classmethod
-    def _runDockerCommand(cls, image: str, command: str, build_folder: str = None, quiet: bool = True):
-        try:
-            pfDevTools.Utils.requireCommand('docker')
-
-            if not OpenFPGACore._dockerIsRunning():
-                raise RuntimeError('Docker engine does not seem to be running.')
-
-            if not OpenFPGACore._dockerHasImage(image):
-                print(f'Docker needs to download image \'{image}\'. This may take a while...')
-                OpenFPGACore._getNumberOfDockerCPUs(image)
-
-            command_line: str = 'docker run --platform linux/amd64 -t --rm '
-
-            if build_folder is not None:
-                command_line += f'-v {build_folder}:/build '
+    def _toolchain(cls, env) -> 'pfDevTools.Toolchain':
+        cpus, memory = pfDevTools.Toolchain.limitsFrom(env.get('PF_COMPILE_CPUS', None), env.get('PF_COMPILE_MEMORY', None))
 
-            command_line += image + ' ' + command
+        return pfDevTools.Toolchain(env['PF_TOOLCHAIN'], env['PF_DOCKER_IMAGE'], env.get('PF_TOOLCHAIN_PREFIX', None), env.get('PF_COMPILE_SERVERS', None), cpus, memory)
 
-            return pfDevTools.Utils.shellCommand(command_line, silent_mode=quiet, capture_output=True)
-        except Exception as e:
-            error_string = str(e)
-
-            if len(error_string) != 0:
-                print(e)
-
-            sys.exit(1)
+    @classmethod
+    def _reusesPartitions(cls, env) -> bool:
+        return env.get('PF_PARTITION_REUSE', None) not in (None, '', '0', False)
 
     @classmethod
-    def _dockerIsRunning(cls) -> bool:
-        try:
-            pfDevTools.Utils.shellCommand('docker ps', silent_mode=True, capture_output=False)
-        except RuntimeError:
-            return False
+    def _canReusePartitions(cls, env) -> bool:
+        # -- Lite has no incremental compilation and Pro replaced it with a different flow, so only Standard can be used.
+        edition = OpenFPGACore._toolchain(env).quartusEdition()
+        if edition == 'Standard':
+            return True
 
-        return True
+        print(f'WARNING: PF_PARTITION_REUSE needs Quartus Prime Standard Edition but the {env["PF_TOOLCHAIN"]} toolchain runs {"an unknown edition" if edition is None else f"the {edition} Edition"}, compiling the whole design instead.')
+        return False
 
     @classmethod
-    def _dockerHasImage(cls, image: str) -> bool:
-        result = pfDevTools.Utils.shellCommand('docker images', silent_mode=True, capture_output=True)
-
-        image_info = image.split(':')
-        if len(image_info) == 2:
-            looking_for = f'{image_info[0]}   {image_info[1]}'
-            for line in result:
-                if line.startswith(looking_for):
-                    return True
+    def coreTemplateFolder(cls, build_folder: str) -> str:
+        return os.path.join(build_folder, '_core_template_repo')
 
-        return False
+    @classmethod
+    def coreSourcesFolder(cls, build_folder: str) -> str:
+        return os.path.join(build_folder, '_core_sources')
 
     @classmethod
-    def _getNumberOfDockerCPUs(cls, image: str, quiet: bool = True) -> int:
-        number_of_cpus: int = 1
+    def coreFpgaFolder(cls, build_folder: str) -> str:
+        return os.path.join(OpenFPGACore.coreTemplateFolder(build_folder), 'src', 'fpga')
 
-        result = OpenFPGACore._runDockerCommand(image, 'grep --count ^processor /proc/cpuinfo', quiet=quiet)
-        if len(result) == 1:
-            num_cpus_found: int = int(result[0])
-            if num_cpus_found != 0:
-                number_of_cpus = num_cpus_found
+    @classmethod
+    def bitstreamFile(cls, build_folder: str) -> str:
+        return os.path.join(OpenFPGACore.coreFpgaFolder(build_folder), 'output_files', 'pf_core.rbf')
 
-        return number_of_cpus
+    @classmethod
+    def defaultDockerImage(cls) -> str:
+        return pfDevTools.Toolchain.defaultDockerImage()
 
     @classmethod
     def _updateQsfFile(cls, target, source, env):
         core_fpga_folder = env['PF_CORE_FPGA_FOLDER']
-        core_verilog_files = [str(Path(str(f)).relative_to(core_fpga_folder)) for f in source]
-        number_of_cpus: int = OpenFPGACore._getNumberOfDockerCPUs(env['PF_DOCKER_IMAGE'])
-        pfDevTools.Qfs([str(source[0]), str(target[0]), f'cpus={number_of_cpus}'] + core_verilog_files[1:]).run()
+        core_sources_folder = env['PF_CORE_SOURCES_FOLDER']
+        core_verilog_files = [os.path.join('core', Path(str(f)).relative_to(core_sources_folder)) for f in source[1:]]
+
+        with pfDevTools.Profiler.span('update qsf file'):
+            # -- The sources only go next to the template now, after it is cloned, so that copying them never waits for the clone.
+            if os.path.exists(core_sources_folder):
+                shutil.copytree(core_sources_folder, os.path.join(core_fpga_folder, 'core'), dirs_exist_ok=True)
+
+            number_of_cpus: int = OpenFPGACore._toolchain(env).numberOfCPUs()
+            arguments: List[str] = [str(source[0]), str(target[0]), f'cpus={number_of_cpus}']
+
+            # -- The framework's post-fit netlist is then kept in incremental_db, which is kept between builds even when
+            # -- compiling in scratch storage, and only the core's partition is compiled again.
+            if OpenFPGACore._reusesPartitions(env) and OpenFPGACore._canReusePartitions(env):
+                arguments.append(f'partition={env["PF_CORE_PARTITION"]}')
+
+            pfDevTools.Qfs(arguments + core_verilog_files).run()
 
     @classmethod
     def _installCore(cls, target, source, env):
-        pfDevTools.Install([str(source[0])]).run()
-        pfDevTools.Eject([]).run()
+        with pfDevTools.Profiler.span('install core'):
+            pfDevTools.Install([str(source[0])]).run()
+            pfDevTools.Eject([]).run()
 
     @classmethod
     def _copyFile(cls, target, source, env):
         source_file = str(source[0])
         target_file = str(target[0])
         parent_dest_dir = Path(target_file).parent
-        os.makedirs(parent_dest_dir, exist_ok=True)
-        shutil.copyfile(source_file, target_file)
+
+        with pfDevTools.Profiler.span('copy source file'):
+            os.makedirs(parent_dest_dir, exist_ok=True)
+            shutil.copyfile(source_file, target_file)
 
     @classmethod
-    def _searchSourceFiles(cls, env, path: str, dest_verilog_folder: str) -> List[str]:
-        dest_verilog_files: List[str] = []
+    def _findSourceFiles(cls, path: str) -> List[str]:
+        src_verilog_files: List[str] = []
 
         for root, dirs, files in os.walk(path, topdown=False):
             for file in files:
                 if file.endswith('.sv') or file.endswith('.v'):
-                    src_path = os.path.join(root, file)
-                    dest_path = os.path.join(dest_verilog_folder, Path(src_path).relative_to(path))
-                    dest_verilog_files.append(dest_path)
+                    src_verilog_files.append(os.path.join(root, file))
 
-                    env.Command(dest_path, src_path, OpenFPGACore._copyFile)
+        return src_verilog_files
+
+    @classmethod
+    def _searchSourceFiles(cls, env, path: str, dest_verilog_folder: str) -> List[str]:
+        dest_verilog_files: List[str] = []
+
+        for src_path in OpenFPGACore._findSourceFiles(path):
+            dest_path = os.path.join(dest_verilog_folder, Path(src_path).relative_to(path))
+            dest_verilog_files.append(dest_path)
+
+            env.Command(dest_path, src_path, OpenFPGACore._copyFile)
 
         return dest_verilog_files
 
@@ -162,21 +249,54 @@ class OpenFPGACore:
 
     @classmethod
     def _compileBitStream(cls, target, source, env):
+        # -- A Docker image still downloading in the background would otherwise be downloaded a second time.
+        OpenFPGACore._waitForPrefetch(f'image:{env["PF_DOCKER_IMAGE"]}')
+
         print('Compiling core bitstream...')
-        OpenFPGACore._runDockerCommand(env['PF_DOCKER_IMAGE'],
-                                       'quartus_sh --flow compile pf_core',
-                                       build_folder=os.path.realpath(env['PF_CORE_FPGA_FOLDER']),
-                                       quiet=False)
+        start_time = time.monotonic()
+        build_folder = os.path.realpath(env['PF_CORE_FPGA_FOLDER'])
+        toolchain = OpenFPGACore._toolchain(env)
+
+        with pfDevTools.Profiler.span('compile bitstream'):
+            toolchain.compile('quartus_sh --flow compile pf_core', build_folder=build_folder, scratch=env['PF_SCRATCH'], quiet=False)
+
+        OpenFPGACore._writeBuildMetrics(target, source, env, time.monotonic() - start_time)
+
+    @classmethod
+    def _writeBuildMetrics(cls, target, source, env, wall_time: float):
+        metrics_file = str(target[1])
+        print(f'Writing build metrics to \'{metrics_file}\'.')
+        pfDevTools.BuildMetrics(str(Path(str(target[0])).parent), 'pf_core').writeTo(metrics_file, wall_time)
 
     @classmethod
     def _packageCore(cls, target, source, env):
         build_process: pfDevTools.Package = pfDevTools.Package([env['PF_CORE_CONFIG_FILE'], env['PF_CORE_BITSTREAM_FILE'], env['PF_BUILD_FOLDER']])
-        print('Packaging core...')
-        build_process.run()
+        with pfDevTools.Profiler.span('package core'):
+            build_process.run()
+
+        # -- The build metrics are kept next to the packaged core so they can be archived alongside it.
+        shutil.copyfile(env['PF_CORE_METRICS_FILE'], str(target[1]))
 
 
 def build(env, config_file: str, extra_files: List[str] = []):
-    env.SetDefault(PF_DOCKER_IMAGE='didiermalenfant/quartus:22.1-apple-silicon')
+    env.SetDefault(PF_DOCKER_IMAGE=OpenFPGACore.defaultDockerImage())
+
+    # -- The toolchain set in the environment wins over the one in the config file, since it depends on the host building the core.
+    config = pfDevTools.CoreConfig(config_file)
+    env.SetDefault(PF_TOOLCHAIN=os.environ.get('PF_TOOLCHAIN', None) or config.buildToolchain() or 'docker')
+    env.SetDefault(PF_TOOLCHAIN_PREFIX=os.environ.get('PF_TOOLCHAIN_PREFIX', None) or config.buildToolchainPrefix())
+    env.SetDefault(PF_COMPILE_SERVERS=os.environ.get('PF_COMPILE_SERVERS', None))
+    env.SetDefault(PF_COMPILE_CPUS=os.environ.get('PF_COMPILE_CPUS', None))
+    env.SetDefault(PF_COMPILE_MEMORY=os.environ.get('PF_COMPILE_MEMORY', None))
+    OpenFPGACore._toolchain(env)
+
+    env.SetDefault(PF_SCRATCH=os.environ.get('PF_SCRATCH', None))
+
+    # -- 'core_top:ic' is the instance of core_top in the core template's apf_top.
+    env.SetDefault(PF_PARTITION_REUSE=os.environ.get('PF_PARTITION_REUSE', None))
+    env.SetDefault(PF_CORE_PARTITION=os.environ.get('PF_CORE_PARTITION', None) or 'core_top:ic')
+    if OpenFPGACore._reusesPartitions(env) and env['PF_TOOLCHAIN'] == 'remote':
+        raise RuntimeError('PF_PARTITION_REUSE cannot be used with the remote toolchain since compile servers only send back output files.')
 
     if env.get('PF_SRC_FOLDER', None) is None:
         env.SetDefault(PF_SRC_FOLDER=Path(config_file).parent)
@@ -188,34 +308,58 @@ def build(env, config_file: str, extra_files: List[str] = []):
 
     env.Replace(PF_CORE_CONFIG_FILE=config_file)
 
-    core_template_folder: str = os.path.join(build_folder, '_core_template_repo')
+    core_template_folder: str = OpenFPGACore.coreTemplateFolder(build_folder)
     env.Replace(PF_CORE_TEMPLATE_FOLDER=core_template_folder)
 
-    core_fpga_folder: str = os.path.join(core_template_folder, 'src', 'fpga')
+    core_fpga_folder: str = OpenFPGACore.coreFpgaFolder(build_folder)
     env.Replace(PF_CORE_FPGA_FOLDER=core_fpga_folder)
 
     core_input_qsf_file = os.path.join(core_fpga_folder, 'ap_core.qsf')
     core_output_qsf_file = os.path.join(core_fpga_folder, 'pf_core.qsf')
 
-    core_output_bitstream_file = os.path.join(core_fpga_folder, 'output_files', 'pf_core.rbf')
+    core_output_bitstream_file = OpenFPGACore.bitstreamFile(build_folder)
     env.Replace(PF_CORE_BITSTREAM_FILE=core_output_bitstream_file)
 
-    dest_verilog_folder: str = os.path.join(core_fpga_folder, 'core')
+    core_output_metrics_file = os.path.join(core_fpga_folder, 'output_files', 'pf_core.metrics.json')
+    env.Replace(PF_CORE_METRICS_FILE=core_output_metrics_file)
+
+    core_sources_folder: str = OpenFPGACore.coreSourcesFolder(build_folder)
+    env.Replace(PF_CORE_SOURCES_FOLDER=core_sources_folder)
+
+    # -- On a fresh build, the core template and the Docker image are downloaded in the background while SCons copies the
+    # -- sources, so that the first compile only waits for the slowest of them instead of all of them one after the other.
+    if OpenFPGACore._isBuilding():
+        if env.get('PF_CORE_TEMPLATE_REPO_FOLDER', None) is None and not os.path.exists(core_input_qsf_file):
+            prefetched_folder = OpenFPGACore._prefetchedFolder(core_template_folder)
+            OpenFPGACore._startPrefetch(prefetched_folder, 'core template', lambda: OpenFPGACore._prefetchTemplate(env, prefetched_folder))
+
+        if env['PF_TOOLCHAIN'] == 'docker' and not os.path.exists(core_output_bitstream_file):
+            toolchain = OpenFPGACore._toolchain(env)
+            OpenFPGACore._startPrefetch(f'image:{env["PF_DOCKER_IMAGE"]}', 'docker image', toolchain.prefetch)
 
     if env.get('PF_CORE_TEMPLATE_REPO_FOLDER', None) is None:
         env.Command(core_input_qsf_file, '', OpenFPGACore._cloneRepo)
     else:
         env.Command(core_input_qsf_file, '', OpenFPGACore._copyRepo)
 
-    dest_verilog_files: List[str] = OpenFPGACore._searchSourceFiles(env, src_folder, dest_verilog_folder)
-    extra_dest_files: List[str] = OpenFPGACore._addExtraFiles(env, src_folder, dest_verilog_folder, extra_files)
+    # -- Cloning deletes the whole template folder so the sources are copied outside of it, and only moved into it by the
+    # -- project file update. Only that update and the compile, which read the template, have to wait for the clone.
+    dest_verilog_files: List[str] = OpenFPGACore._searchSourceFiles(env, src_folder, core_sources_folder)
+    extra_dest_files: List[str] = OpenFPGACore._addExtraFiles(env, src_folder, core_sources_folder, extra_files)
+
+    qsf_file = env.Command(core_output_qsf_file, [core_input_qsf_file] + dest_verilog_files, OpenFPGACore._updateQsfFile)
+    env.Depends(qsf_file, extra_dest_files)
 
-    env.Command(core_output_qsf_file, [core_input_qsf_file] + dest_verilog_files, OpenFPGACore._updateQsfFile)
-    env.Command(core_output_bitstream_file, [core_output_qsf_file] + dest_verilog_files + extra_dest_files, OpenFPGACore._compileBitStream)
+    # -- The number of CPUs written in the project file depends on the toolchain and its limits so changing them updates it,
+    # -- and so does the partitioning.
+    partitioning = env['PF_CORE_PARTITION'] if OpenFPGACore._reusesPartitions(env) else 'none'
+    env.Depends(qsf_file, env.Value(f'{env["PF_TOOLCHAIN"]} {env["PF_DOCKER_IMAGE"]} {env["PF_TOOLCHAIN_PREFIX"]} {env["PF_COMPILE_SERVERS"]} {env["PF_COMPILE_CPUS"]} {partitioning}'))
+    env.Command([core_output_bitstream_file, core_output_metrics_file], [core_output_qsf_file] + dest_verilog_files + extra_dest_files, OpenFPGACore._compileBitStream)
 
     build_process: pfDevTools.Package = pfDevTools.Package([config_file, core_output_bitstream_file, build_folder])
     packaged_core = os.path.join(build_folder, build_process.packagedFilename())
-    p = env.Command(packaged_core, build_process.dependencies(), OpenFPGACore._packageCore)
+    packaged_metrics = os.path.splitext(packaged_core)[0] + '-metrics.json'
+    p = env.Command([packaged_core, packaged_metrics], build_process.dependencies() + [core_output_metrics_file], OpenFPGACore._packageCore)
 
     env.Default(packaged_core)
     env.Clean(packaged_core, build_folder)
@@ -16,3 +16,34 @@ class Paths:
     @classmethod
     def appUpdateCheckFile(cls):
         return os.path.join(Paths.tempFolder(), 'app-update-check')
+
+    @classmethod
+    def appUpdateAttemptFile(cls):
+        return os.path.join(Paths.tempFolder(), 'app-update-attempt')
+
+    @classmethod
+    def cacheFolder(cls):
+        # -- PF_CACHE_FOLDER can be used to share the cache between CI jobs or to move it to a faster drive.
+        cache_folder = os.environ.get('PF_CACHE_FOLDER', None)
+        if cache_folder is not None:
+            return os.path.expanduser(cache_folder)
+
+        return os.path.join(os.path.expanduser('~'), '.cache', 'io.projectfreedom')
+
+    @classmethod
+    def repoCacheFolder(cls):
+        return os.path.join(Paths.cacheFolder(), 'repos')
+
+    @classmethod
+    def daemonFolder(cls):
+        # -- Only ever accessible by its user, see Daemon._checkFolder().
+        runtime_folder = os.environ.get('XDG_RUNTIME_DIR', None)
+        if runtime_folder is not None and os.path.isdir(runtime_folder):
+            return os.path.join(runtime_folder, 'io.projectfreedom')
+
+        user_id = os.getuid() if hasattr(os, 'getuid') else 0
+        return os.path.join(tempfile.gettempdir(), f'io.projectfreedom-daemon-{user_id}')
+
+    @classmethod
+    def daemonSocketFile(cls):
+        return os.path.join(Paths.daemonFolder(), 'pf-daemon.sock')
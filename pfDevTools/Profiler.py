@@ -0,0 +1,151 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import json
+import time
+import atexit
+import tempfile
+import threading
+import contextlib
+
+from typing import Dict
+from typing import List
+from typing import Optional
+
+
+# -- Classes
+class Profiler:
+    """Record timing spans for the phases and subprocesses of a pf command."""
+
+    # -- Child processes (like scons) find the events file in their environment and append their own spans to it when they exit.
+    _events_file_variable: str = 'PF_PROFILE_EVENTS_FILE'
+
+    _events: List[Dict] = []
+    _lock = threading.Lock()
+    _is_owner: bool = False
+    _exit_handler_registered: bool = False
+
+    @classmethod
+    def _eventsFile(cls) -> Optional[str]:
+        return os.environ.get(Profiler._events_file_variable, None)
+
+    @classmethod
+    def _appendEventsToFile(cls) -> None:
+        events_file = Profiler._eventsFile()
+        if events_file is None:
+            return
+
+        with Profiler._lock:
+            lines = ''.join(json.dumps(event) + '\n' for event in Profiler._events)
+            Profiler._events = []
+
+        if len(lines) == 0:
+            return
+
+        with contextlib.suppress(OSError):
+            with open(events_file, 'a') as out_file:
+                out_file.write(lines)
+
+    @classmethod
+    def _record(cls, name: str, category: str, start: int, end: int) -> None:
+        event = {'name': name,
+                 'cat': category,
+                 'ph': 'X',
+                 'ts': start // 1000,
+                 'dur': (end - start) // 1000,
+                 'pid': os.getpid(),
+                 'tid': threading.get_ident()}
+
+        with Profiler._lock:
+            Profiler._events.append(event)
+
+            if not Profiler._is_owner and not Profiler._exit_handler_registered:
+                atexit.register(Profiler._appendEventsToFile)
+                Profiler._exit_handler_registered = True
+
+    @classmethod
+    def isEnabled(cls) -> bool:
+        return Profiler._eventsFile() is not None
+
+    @classmethod
+    def start(cls) -> None:
+        handle, events_file = tempfile.mkstemp(prefix='pf-profile-', suffix='.jsonl')
+        os.close(handle)
+
+        os.environ[Profiler._events_file_variable] = events_file
+        Profiler._is_owner = True
+
+    @classmethod
+    @contextlib.contextmanager
+    def span(cls, name: str, category: str = 'phase'):
+        if not Profiler.isEnabled():
+            yield
+            return
+
+        start = time.time_ns()
+        try:
+            yield
+        finally:
+            Profiler._record(name, category, start, time.time_ns())
+
+    @classmethod
+    def events(cls) -> List[Dict]:
+        with Profiler._lock:
+            events = list(Profiler._events)
+
+        events_file = Profiler._eventsFile()
+        if events_file is not None and os.path.exists(events_file):
+            with open(events_file, 'r') as in_file:
+                for line in in_file.readlines():
+                    with contextlib.suppress(ValueError):
+                        events.append(json.loads(line))
+
+        return sorted(events, key=lambda event: event['ts'])
+
+    @classmethod
+    def printSummary(cls, events: List[Dict]) -> None:
+        totals: Dict[tuple, List[float]] = {}
+        for event in events:
+            key = (event['cat'], event['name'])
+            duration = event['dur'] / 1000000.0
+
+            total = totals.setdefault(key, [0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += duration
+            total[2] = max(total[2], duration)
+
+        print('')
+        print('Profile summary:')
+        print(f'   {"category":<12} {"name":<48} {"count":>6} {"total (s)":>10} {"max (s)":>10}')
+
+        for key, total in sorted(totals.items(), key=lambda item: item[1][1], reverse=True):
+            name = key[1] if len(key[1]) <= 48 else key[1][:45] + '...'
+            print(f'   {key[0]:<12} {name:<48} {total[0]:>6} {total[1]:>10.3f} {total[2]:>10.3f}')
+
+    @classmethod
+    def writeTrace(cls, events: List[Dict], trace_file: str) -> None:
+        with open(trace_file, 'w') as out_file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, out_file)
+
+        print(f'Wrote profile trace to \'{trace_file}\'.')
+
+    @classmethod
+    def finish(cls, trace_file: str = None) -> None:
+        if not Profiler._is_owner:
+            return
+
+        events = Profiler.events()
+
+        Profiler.printSummary(events)
+        if trace_file is not None:
+            Profiler.writeTrace(events, trace_file)
+
+        events_file = Profiler._eventsFile()
+        with contextlib.suppress(OSError):
+            os.remove(events_file)
+
+        del os.environ[Profiler._events_file_variable]
+        Profiler._is_owner = False
+        Profiler._events = []
@@ -0,0 +1,114 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+import pfDevTools.Git
+import pfDevTools.Paths
+import pfDevTools.Utils
+
+
+# -- Classes
+class RepoCache:
+    """A local bare mirror of a git repo used to export its content without going back to the network."""
+
+    def __init__(self, url: str, cache_folder: str = None):
+        """Setup the mirror for the repo at url, optionally in a given cache folder."""
+
+        self._git = pfDevTools.Git(url)
+
+        if cache_folder is None:
+            cache_folder = pfDevTools.Paths.repoCacheFolder()
+
+        # -- Mirrors are keyed on the repo url, each mirror then holds all the tags and branches of that repo.
+        url_hash = hashlib.sha1(self._git.url.encode('utf-8')).hexdigest()[:12]
+        readable_name = re.sub('[^A-Za-z0-9_.-]', '_', url.rstrip('/').split('/')[-1])
+        self._mirror_folder: str = os.path.join(cache_folder, f'{readable_name}-{url_hash}.git')
+
+    def _hasTag(self, tag: str) -> bool:
+        try:
+            self._git.gitInMirror(self._mirror_folder, ['rev-parse', '--verify', '--quiet', f'refs/tags/{tag}^{{commit}}'])
+        except RuntimeError:
+            return False
+
+        return True
+
+    def _hasRef(self, ref: str) -> bool:
+        try:
+            self._git.gitInMirror(self._mirror_folder, ['rev-parse', '--verify', '--quiet', f'{ref}^{{commit}}'])
+        except RuntimeError:
+            return False
+
+        return True
+
+    def _createMirror(self) -> None:
+        parent_folder = os.path.dirname(self._mirror_folder)
+        os.makedirs(parent_folder, exist_ok=True)
+
+        # -- We clone in a temporary folder first so that concurrent builds never see a half-cloned mirror.
+        temp_folder = tempfile.mkdtemp(dir=parent_folder)
+        try:
+            temp_mirror = os.path.join(temp_folder, 'mirror.git')
+            self._git.mirrorIn(temp_mirror)
+
+            try:
+                os.rename(temp_mirror, self._mirror_folder)
+            except OSError:
+                if not os.path.exists(self._mirror_folder):
+                    raise
+        finally:
+            pfDevTools.Utils.deleteFolder(temp_folder, force_delete=True)
+
+    def update(self, ref: str = None) -> None:
+        if not os.path.exists(self._mirror_folder):
+            print(f'Caching repo \'{self._git.url}\'.')
+            self._createMirror()
+            return
+
+        # -- Tags are not supposed to move so if we already have it there is no need to go back to the network.
+        if ref is not None and self._hasTag(ref):
+            return
+
+        try:
+            self._git.fetchInMirror(self._mirror_folder)
+        except RuntimeError as e:
+            if ref is None:
+                ref = 'HEAD'
+
+            if not self._hasRef(ref):
+                raise
+
+            print(f'Could not update cached repo, using cached \'{ref}\' instead ({str(e)}).')
+
+    def exportTo(self, dest_folder: str, ref: str = None) -> None:
+        self.update(ref)
+
+        if ref is None:
+            ref = 'HEAD'
+        elif not self._hasRef(ref):
+            raise RuntimeError(f'Cannot find tag or branch \'{ref}\' in repo \'{self._git.url}\'.')
+
+        archive = self._git.gitInMirror(self._mirror_folder, ['archive', '--format=tar', ref])
+
+        # -- Imported here since every pf command imports this module at startup.
+        import io
+        import tarfile
+
+        os.makedirs(dest_folder, exist_ok=True)
+        try:
+            with tarfile.open(fileobj=io.BytesIO(archive), mode='r:') as tar:
+                if hasattr(tarfile, 'data_filter'):
+                    tar.extractall(dest_folder, filter='data')
+                else:
+                    tar.extractall(dest_folder)
+        except Exception:
+            shutil.rmtree(dest_folder, ignore_errors=True)
+            raise
+
+    @classmethod
+    def isEnabled(cls) -> bool:
+        return os.environ.get('PF_NO_REPO_CACHE', None) is None
@@ -0,0 +1,173 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import math
+
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .Utils import Utils
+
+
+# -- Classes
+class Resources:
+    """The CPUs and memory this process can actually use, taking affinity masks, cgroup limits and Docker's settings into account."""
+
+    _cgroup_root: str = '/sys/fs/cgroup'
+
+    # -- Results are remembered for the life of the process, except for available memory which changes all the time.
+    _results: Dict[str, object] = {}
+
+    @classmethod
+    def _readFile(cls, path: str) -> Optional[str]:
+        try:
+            with open(path, 'r') as in_file:
+                return in_file.read().strip()
+        except OSError:
+            return None
+
+    @classmethod
+    def _cgroupPaths(cls) -> Dict[str, str]:
+        # -- Maps each cgroup v1 controller, or '' for cgroup v2, to this process' cgroup path.
+        paths: Dict[str, str] = {}
+
+        for line in (Resources._readFile('/proc/self/cgroup') or '').splitlines():
+            components = line.split(':', 2)
+            if len(components) != 3:
+                continue
+
+            for controller in components[1].split(','):
+                paths[controller] = components[2]
+
+        return paths
+
+    @classmethod
+    def _cgroupFiles(cls, controller: str, filename: str) -> List[str]:
+        # -- Inside a container the cgroup namespace usually makes our own cgroup the root, so both places are looked at.
+        path = Resources._cgroupPaths().get(controller, '/')
+        folder = Resources._cgroup_root if controller == '' else os.path.join(Resources._cgroup_root, controller)
+
+        candidates = [os.path.join(folder, path.lstrip('/'), filename), os.path.join(folder, filename)]
+        return list(dict.fromkeys(candidates))
+
+    @classmethod
+    def _readCgroupValue(cls, controller: str, filename: str) -> Optional[str]:
+        for path in Resources._cgroupFiles(controller, filename):
+            value = Resources._readFile(path)
+            if value is not None:
+                return value
+
+        return None
+
+    @classmethod
+    def _cgroupCPUQuota(cls) -> Optional[float]:
+        # -- cgroup v2 gives 'quota period' in cpu.max, v1 gives them in two files. A quota of max or -1 means no limit.
+        cpu_max = Resources._readCgroupValue('', 'cpu.max')
+        if cpu_max is not None:
+            components = cpu_max.split()
+            if len(components) == 2 and components[0] != 'max':
+                try:
+                    return int(components[0]) / int(components[1])
+                except (ValueError, ZeroDivisionError):
+                    return None
+
+            return None
+
+        quota = Resources._readCgroupValue('cpu', 'cpu.cfs_quota_us')
+        period = Resources._readCgroupValue('cpu', 'cpu.cfs_period_us')
+        try:
+            if quota is not None and period is not None and int(quota) > 0:
+                return int(quota) / int(period)
+        except (ValueError, ZeroDivisionError):
+            pass
+
+        return None
+
+    @classmethod
+    def _cgroupMemory(cls) -> Tuple[Optional[int], Optional[int]]:
+        # -- Returns the memory limit and current usage, in bytes, if there is a limit.
+        limit = Resources._readCgroupValue('', 'memory.max')
+        usage = Resources._readCgroupValue('', 'memory.current')
+        if limit is None:
+            limit = Resources._readCgroupValue('memory', 'memory.limit_in_bytes')
+            usage = Resources._readCgroupValue('memory', 'memory.usage_in_bytes')
+
+        try:
+            limit_in_bytes = int(limit)
+        except (TypeError, ValueError):
+            return None, None
+
+        # -- cgroup v1 reports no limit as a huge number.
+        if limit_in_bytes >= (1 << 60):
+            return None, None
+
+        try:
+            return limit_in_bytes, int(usage)
+        except (TypeError, ValueError):
+            return limit_in_bytes, None
+
+    @classmethod
+    def availableCPUs(cls) -> int:
+        number_of_cpus = Resources._results.get('cpus', None)
+        if number_of_cpus is not None:
+            return number_of_cpus
+
+        if hasattr(os, 'sched_getaffinity'):
+            number_of_cpus = len(os.sched_getaffinity(0))
+        else:
+            number_of_cpus = os.cpu_count() or 1
+
+        quota = Resources._cgroupCPUQuota()
+        if quota is not None:
+            number_of_cpus = min(number_of_cpus, max(1, math.ceil(quota)))
+
+        number_of_cpus = max(1, number_of_cpus)
+        Resources._results['cpus'] = number_of_cpus
+
+        return number_of_cpus
+
+    @classmethod
+    def availableMemory(cls) -> int:
+        # -- In bytes, 0 if it can't be found.
+        available = 0
+
+        meminfo = Resources._readFile('/proc/meminfo')
+        if meminfo is not None:
+            for line in meminfo.splitlines():
+                if line.startswith('MemAvailable:'):
+                    available = int(line.split()[1]) * 1024
+                    break
+        else:
+            try:
+                available = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+            except (OSError, ValueError, AttributeError):
+                pass
+
+        limit, usage = Resources._cgroupMemory()
+        if limit is not None:
+            cgroup_available = max(0, limit - (usage or 0))
+            available = cgroup_available if available == 0 else min(available, cgroup_available)
+
+        return available
+
+    @classmethod
+    def dockerLimits(cls) -> Tuple[int, int]:
+        # -- The CPUs and memory, in bytes, Docker gives containers. With Docker Desktop these are the settings of its VM.
+        # -- This asks the engine instead of starting a container, and returns (0, 0) if Docker is not available.
+        limits = Resources._results.get('docker', None)
+        if limits is not None:
+            return limits
+
+        try:
+            result = Utils.shellCommand('docker info --format {{.NCPU}},{{.MemTotal}}', silent_mode=True, capture_output=True)
+            cpus, memory = result[0].split(',')
+            limits = (int(cpus), int(memory))
+        except (RuntimeError, IndexError, ValueError):
+            return 0, 0
+
+        Resources._results['docker'] = limits
+        return limits
@@ -2,13 +2,79 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import os
+import sys
 import pfDevTools.OpenFPGACore
 import SCons.Environment
 
+from typing import Dict
+from typing import List
+
+from .Profiler import Profiler
+
+
+def defaultNumberOfJobs() -> int:
+    return pfDevTools.Resources.availableCPUs()
+
+
+def _configureBuild(env) -> None:
+    import SCons.Script
+    import SCons.Script.Main
+
+    # -- Build variables given on the command line, like PF_DECIDER with `pf make decider=...`, win over the ones given here.
+    env.Decider(SCons.Script.ARGUMENTS.get('PF_DECIDER', env.get('PF_DECIDER', 'MD5-timestamp')))
+
+    # -- Options can only be set when this is called from an SConstruct file.
+    if isinstance(SCons.Script.Main.OptionsParser, SCons.Script.Main.FakeOptionParser):
+        return
+
+    # -- Both of these are only defaults, --jobs and --implicit-cache on the command line still win.
+    SCons.Script.SetOption('num_jobs', int(env.get('PF_JOBS', defaultNumberOfJobs())))
+    SCons.Script.SetOption('implicit_cache', True)
+
+    # -- Keeping the signatures in the build folder means cleaning the build also resets them. When cleaning, the
+    # -- build folder is deleted before SCons writes its signatures so those go in per-folder files instead.
+    if SCons.Script.GetOption('clean'):
+        env.SConsignFile(None)
+    else:
+        build_folder: str = env.get('PF_BUILD_FOLDER', '_build')
+        env.SConsignFile(os.path.join(os.path.abspath(build_folder), '.sconsign'))
+
 
 def SConsEnvironment(**kwargs):
     env = SCons.Environment.Environment(**kwargs)
 
     env.AddMethod(pfDevTools.OpenFPGACore.build, 'OpenFPGACore')
 
+    _configureBuild(env)
+
     return env
+
+
+def runSCons(options: List[str], targets: List[str] = [], jobs: int = None, variables: Dict[str, str] = {}) -> None:
+    """Run SCons in this process, like `scons` would with the same options, build variables and targets."""
+
+    import SCons.Script.Main
+
+    arguments: List[str] = list(options)
+    if jobs is not None:
+        arguments.append(f'--jobs={jobs}')
+
+    arguments += [f'{name}={value}' for name, value in variables.items()]
+    arguments += targets
+
+    # -- SCons only reads its command line from sys.argv and keeps global state so this can only be called once per process.
+    saved_argv = sys.argv
+    sys.argv = ['scons'] + arguments
+
+    exit_code = 0
+    try:
+        with Profiler.span(' '.join(['scons'] + arguments), 'scons'):
+            SCons.Script.Main.main()
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        sys.argv = saved_argv
+
+    if exit_code != 0:
+        raise RuntimeError
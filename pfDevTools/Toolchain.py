@@ -0,0 +1,384 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import re
+import sys
+import shutil
+import hashlib
+
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .Resources import Resources
+from .Utils import Utils
+
+
+# -- Classes
+class _DockerBackend:
+    """Runs Quartus in a Docker container, with the build folder mounted at /build."""
+
+    # -- Positive Docker probe results are remembered for the life of the process (for example by the pf daemon).
+    _probe_results: Dict[str, object] = {}
+
+    def __init__(self, image: str, cpus: int = None, memory: float = None):
+        self._image: str = image
+        self._cpus: int = cpus
+        self._memory: float = memory
+
+    def _isRunning(self) -> bool:
+        if _DockerBackend._probe_results.get('running', False):
+            return True
+
+        try:
+            Utils.shellCommand('docker ps', silent_mode=True, capture_output=False)
+        except RuntimeError:
+            return False
+
+        _DockerBackend._probe_results['running'] = True
+        return True
+
+    def _hasImage(self) -> bool:
+        if _DockerBackend._probe_results.get(f'image:{self._image}', False):
+            return True
+
+        result = Utils.shellCommand('docker images', silent_mode=True, capture_output=True)
+
+        image_info = self._image.split(':')
+        if len(image_info) == 2:
+            looking_for = f'{image_info[0]}   {image_info[1]}'
+            for line in result:
+                if line.startswith(looking_for):
+                    _DockerBackend._probe_results[f'image:{self._image}'] = True
+                    return True
+
+        return False
+
+    def _pullImage(self) -> None:
+        print(f'Docker needs to download image \'{self._image}\'. This may take a while...')
+        Utils.shellCommand(f'docker pull --platform linux/amd64 {self._image}', silent_mode=True)
+        _DockerBackend._probe_results[f'image:{self._image}'] = True
+
+    def run(self, command: str, build_folder: str, quiet: bool, line_handler: Callable[[str], None] = None, mount: str = None, build_folder_mount: str = '/build') -> List[str]:
+        Utils.requireCommand('docker')
+
+        if not self._isRunning():
+            raise RuntimeError('Docker engine does not seem to be running.')
+
+        if not self._hasImage():
+            self._pullImage()
+
+        command_line: str = 'docker run --platform linux/amd64 -t --rm '
+
+        if build_folder is not None:
+            command_line += f'-v {build_folder}:{build_folder_mount} '
+
+        if mount is not None:
+            command_line += mount + ' '
+
+        # -- Limits the container so that several compiles running at the same time don't run the host out of memory.
+        if self._cpus is not None:
+            command_line += f'--cpus={self._cpus} '
+
+        if self._memory is not None:
+            command_line += f'--memory={int(self._memory * 1024)}m '
+
+        command_line += self._image + ' ' + command
+
+        return Utils.shellCommand(command_line, silent_mode=quiet, capture_output=True, line_handler=line_handler)
+
+    def runInScratch(self, command: str, build_folder: str, scratch: str, quiet: bool, line_handler: Callable[[str], None] = None) -> List[str]:
+        # -- The build folder is mounted at /src and the scratch storage at /build, where the command runs. Everything happens
+        # -- in one container so the script has to be a file, commands are not run through a shell.
+        script_file = os.path.join(build_folder, _ScratchFolder.docker_script)
+        with open(script_file, 'w') as out_file:
+            out_file.write('set -e\n')
+            for folder in _ScratchFolder.database_folders:
+                out_file.write(f'if [ ! -d /src/{folder} ]; then rm -rf /build/{folder}; elif [ ! -d /build/{folder} ]; then cp -a /src/{folder} /build/; fi\n')
+
+            excludes = ' '.join(f'--exclude=./{folder}' for folder in _ScratchFolder.excluded_folders + [_ScratchFolder.docker_script])
+            out_file.write(f'(cd /src && tar -cf - {excludes} .) | (cd /build && tar -xf -)\n')
+            out_file.write(f'cd /build\nstatus=0\n{command} || status=$?\n')
+
+            # -- Output files are copied back even if the compile failed since they contain Quartus' reports.
+            for folder in _ScratchFolder.copied_back_folders:
+                out_file.write(f'rm -rf /src/{folder}\nif [ -d {folder} ]; then cp -a {folder} /src/; fi\n')
+
+            out_file.write('exit $status\n')
+
+        if scratch == 'volume':
+            mount = f'-v {_ScratchFolder.nameFor(build_folder)}:/build'
+        else:
+            mount = '--tmpfs /build:exec'
+
+        return self.run(f'sh /src/{_ScratchFolder.docker_script}', build_folder, quiet, line_handler, mount=mount, build_folder_mount='/src')
+
+    def numberOfCPUs(self) -> int:
+        return Resources.dockerLimits()[0] or 1
+
+    def probe(self) -> bool:
+        if not Utils.commandExists('docker') or not self._isRunning() or not self._hasImage():
+            return False
+
+        self.numberOfCPUs()
+        return True
+
+    def prefetch(self) -> None:
+        if Utils.commandExists('docker') and self._isRunning() and not self._hasImage():
+            self._pullImage()
+
+
+class _NativeBackend:
+    """Runs Quartus installed on the host, in the build folder."""
+
+    def run(self, command: str, build_folder: str, quiet: bool, line_handler: Callable[[str], None] = None) -> List[str]:
+        Utils.requireCommand(command.split(' ')[0])
+
+        return Utils.shellCommand(command, from_dir=build_folder or '.', silent_mode=quiet, capture_output=True, line_handler=line_handler)
+
+    def numberOfCPUs(self) -> int:
+        return Resources.availableCPUs()
+
+    def probe(self) -> bool:
+        return Utils.commandExists('quartus_sh')
+
+    def prefetch(self) -> None:
+        pass
+
+
+class _PrefixBackend:
+    """Runs Quartus through a custom command prefix, in the build folder. For example a wrapper script or another container runtime."""
+
+    def __init__(self, prefix: str):
+        self._prefix: str = prefix
+
+        # -- Remembered for the life of the process, like the Docker probes.
+        self._number_of_cpus: int = None
+
+    def run(self, command: str, build_folder: str, quiet: bool, line_handler: Callable[[str], None] = None) -> List[str]:
+        return Utils.shellCommand(f'{self._prefix} {command}', from_dir=build_folder or '.', silent_mode=quiet, capture_output=True, line_handler=line_handler)
+
+    def numberOfCPUs(self) -> int:
+        if self._number_of_cpus is None:
+            # -- The prefix may run commands on another machine so its CPUs are counted the same way Docker's are.
+            try:
+                result = self.run('grep --count ^processor /proc/cpuinfo', None, True)
+                self._number_of_cpus = int(result[0]) if len(result) == 1 and int(result[0]) != 0 else 1
+            except (RuntimeError, ValueError):
+                self._number_of_cpus = 1
+
+        return self._number_of_cpus
+
+    def probe(self) -> bool:
+        return Utils.commandExists(self._prefix.split(' ')[0])
+
+    def prefetch(self) -> None:
+        pass
+
+
+class _RemoteBackend:
+    """Sends compiles to pf compile servers, see pf server."""
+
+    def __init__(self, servers: str):
+        from .CompileFarm import CompileFarm
+
+        self._compile_farm = CompileFarm(servers)
+
+    def run(self, command: str, build_folder: str, quiet: bool, line_handler: Callable[[str], None] = None) -> List[str]:
+        if build_folder is None:
+            raise RuntimeError(f'The remote toolchain can only run compiles, not \'{command}\'.')
+
+        return self._compile_farm.compile(command, build_folder, quiet, line_handler)
+
+    def numberOfCPUs(self) -> int:
+        return self._compile_farm.cpusPerJob()
+
+    def probe(self) -> bool:
+        return True
+
+    def prefetch(self) -> None:
+        pass
+
+
+class _ScratchFolder:
+    """A copy of the build folder on fast storage, for example a RAM disk, where Quartus does all its small file I/O."""
+
+    # -- Quartus' databases, which are kept in the scratch folder between builds so that compiles stay incremental.
+    database_folders: List[str] = ['db', 'incremental_db']
+    copied_back_folders: List[str] = ['output_files'] + database_folders
+    excluded_folders: List[str] = copied_back_folders
+
+    docker_script: str = '_pf_scratch.sh'
+
+    def __init__(self, build_folder: str, scratch_root: str):
+        self._build_folder: str = build_folder
+        self.path: str = os.path.join(scratch_root, _ScratchFolder.nameFor(build_folder))
+
+    @classmethod
+    def nameFor(cls, build_folder: str) -> str:
+        return 'pf-scratch-' + hashlib.sha1(os.path.realpath(build_folder).encode('utf-8')).hexdigest()[:12]
+
+    def syncIn(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+
+        # -- A scratch folder lost, for example after a reboot, starts again from the databases copied back by the last build.
+        # -- Databases missing from the build folder mean it was cleaned so the ones in the scratch folder go too.
+        for folder in _ScratchFolder.database_folders:
+            source = os.path.join(self._build_folder, folder)
+            dest = os.path.join(self.path, folder)
+            if not os.path.isdir(source):
+                shutil.rmtree(dest, ignore_errors=True)
+            elif not os.path.exists(dest):
+                shutil.copytree(source, dest)
+
+        for root, dirs, files in os.walk(self._build_folder):
+            if root == self._build_folder:
+                dirs[:] = [folder for folder in dirs if folder not in _ScratchFolder.excluded_folders]
+
+            dest_folder = os.path.join(self.path, os.path.relpath(root, self._build_folder))
+            os.makedirs(dest_folder, exist_ok=True)
+
+            # -- Only files that changed since the last build are copied.
+            for file in files:
+                source = os.path.join(root, file)
+                dest = os.path.join(dest_folder, file)
+
+                source_info = os.stat(source)
+                try:
+                    dest_info = os.stat(dest)
+                    if dest_info.st_size == source_info.st_size and dest_info.st_mtime_ns == source_info.st_mtime_ns:
+                        continue
+                except FileNotFoundError:
+                    pass
+
+                shutil.copy2(source, dest)
+
+    def copyBack(self) -> None:
+        for folder in _ScratchFolder.copied_back_folders:
+            source = os.path.join(self.path, folder)
+            dest = os.path.join(self._build_folder, folder)
+
+            if os.path.exists(dest):
+                shutil.rmtree(dest)
+
+            if os.path.isdir(source):
+                shutil.copytree(source, dest)
+
+
+class Toolchain:
+    """Runs the Quartus command line tools for a build, in Docker, natively or through a custom command prefix."""
+
+    _names: List[str] = ['docker', 'native', 'custom', 'remote']
+
+    def __init__(self, name: str = 'docker', docker_image: str = None, prefix: str = None, servers: str = None, cpus: int = None, memory: float = None):
+        """Constructor based on the toolchain name, the docker image, command prefix or compile servers it needs and optional limits."""
+
+        # -- cpus and memory, in GB, limit what each compile can use. Memory can only be enforced by the docker toolchain.
+
+        if name not in Toolchain._names:
+            raise RuntimeError(f'Unknown toolchain \'{name}\'. Valid toolchains are {", ".join(Toolchain._names)}.')
+
+        if (cpus is not None and cpus < 1) or (memory is not None and memory <= 0):
+            raise RuntimeError('Compile CPU and memory limits should be positive numbers.')
+
+        self.name: str = name
+        self._cpus: int = cpus
+
+        if name == 'docker':
+            self._backend = _DockerBackend(docker_image or Toolchain.defaultDockerImage(), cpus, memory)
+        elif name == 'native':
+            self._backend = _NativeBackend()
+        elif name == 'remote':
+            self._backend = _RemoteBackend(servers or '')
+        else:
+            if prefix is None or len(prefix.strip()) == 0:
+                raise RuntimeError('The custom toolchain needs a command prefix, for example from PF_TOOLCHAIN_PREFIX.')
+
+            self._backend = _PrefixBackend(prefix.strip())
+
+    @classmethod
+    def names(cls) -> List[str]:
+        return Toolchain._names
+
+    @classmethod
+    def defaultDockerImage(cls) -> str:
+        return 'didiermalenfant/quartus:22.1-apple-silicon'
+
+    @classmethod
+    def limitsFrom(cls, cpus, memory) -> Tuple[int, float]:
+        # -- Limits can come from the environment or build variables as strings, empty ones mean no limit.
+        try:
+            return (int(cpus) if cpus not in (None, '') else None), (float(memory) if memory not in (None, '') else None)
+        except ValueError:
+            raise RuntimeError('PF_COMPILE_CPUS should be a whole number and PF_COMPILE_MEMORY a number of GB.')
+
+    @classmethod
+    def fromEnvironment(cls) -> 'Toolchain':
+        cpus, memory = Toolchain.limitsFrom(os.environ.get('PF_COMPILE_CPUS', None), os.environ.get('PF_COMPILE_MEMORY', None))
+
+        return Toolchain(os.environ.get('PF_TOOLCHAIN', 'docker'), os.environ.get('PF_DOCKER_IMAGE', None), os.environ.get('PF_TOOLCHAIN_PREFIX', None), os.environ.get('PF_COMPILE_SERVERS', None), cpus, memory)
+
+    def _exitOnError(self, function, *arguments):
+        try:
+            return function(*arguments)
+        except Exception as e:
+            error_string = str(e)
+
+            if len(error_string) != 0:
+                print(e)
+
+            sys.exit(1)
+
+    def run(self, command: str, build_folder: str = None, quiet: bool = True, line_handler: Callable[[str], None] = None) -> List[str]:
+        return self._exitOnError(self._backend.run, command, build_folder, quiet, line_handler)
+
+    def _runInScratchFolder(self, command: str, build_folder: str, scratch: str, quiet: bool, line_handler: Callable[[str], None]) -> List[str]:
+        scratch_folder = _ScratchFolder(build_folder, os.path.expanduser(scratch))
+        scratch_folder.syncIn()
+
+        try:
+            return self._backend.run(command, scratch_folder.path, quiet, line_handler)
+        finally:
+            # -- Output files are copied back even if the compile failed since they contain Quartus' reports.
+            scratch_folder.copyBack()
+
+    def compile(self, command: str, build_folder: str, scratch: str = None, quiet: bool = True, line_handler: Callable[[str], None] = None) -> List[str]:
+        # -- scratch is either 'volume' or 'tmpfs' to compile in a Docker named volume or tmpfs mount, or a folder on fast storage.
+        if scratch is None or len(scratch) == 0:
+            return self.run(command, build_folder, quiet, line_handler)
+
+        if scratch == 'volume' or scratch == 'tmpfs':
+            if self.name != 'docker':
+                print(f'Scratch storage \'{scratch}\' can only be used with the docker toolchain.')
+                sys.exit(1)
+
+            return self._exitOnError(self._backend.runInScratch, command, build_folder, scratch, quiet, line_handler)
+
+        return self._exitOnError(self._runInScratchFolder, command, build_folder, scratch, quiet, line_handler)
+
+    def quartusEdition(self) -> Optional[str]:
+        # -- 'Lite', 'Standard' or 'Pro', None if Quartus doesn't say.
+        for line in self.run('quartus_sh --version'):
+            match = re.search(r'\b(Lite|Standard|Pro) Edition\b', line)
+            if match is not None:
+                return match.group(1)
+
+        return None
+
+    def numberOfCPUs(self) -> int:
+        number_of_cpus = self._exitOnError(self._backend.numberOfCPUs)
+
+        return number_of_cpus if self._cpus is None else min(number_of_cpus, self._cpus)
+
+    def probe(self) -> bool:
+        # -- Runs all the probes ahead of time so their results are remembered. Returns False if the toolchain is not usable.
+        return self._backend.probe()
+
+    def prefetch(self) -> None:
+        # -- Downloads anything the toolchain needs before it can compile, like the Docker image. Errors are left for the
+        # -- compile to report.
+        self._backend.prefetch()
@@ -9,8 +9,11 @@ import errno
 import stat
 import time
 
+from typing import Callable
 from typing import List
 
+from .Profiler import Profiler
+
 
 # -- Classes
 class Utils:
@@ -24,7 +27,13 @@ class Utils:
             raise
 
     @classmethod
-    def shellCommand(cls, command_and_args: str, from_dir: str = '.', silent_mode=False, env=None, capture_output=False) -> List[str]:
+    def shellCommand(cls, command_and_args: str, from_dir: str = '.', silent_mode=False, env=None, capture_output=False, line_handler: Callable[[str], None] = None) -> List[str]:
+        # -- line_handler, if given, is called with each line of output instead of printing it.
+        with Profiler.span(command_and_args, 'subprocess'):
+            return Utils._shellCommand(command_and_args, from_dir, silent_mode, env, capture_output, line_handler)
+
+    @classmethod
+    def _shellCommand(cls, command_and_args: str, from_dir: str, silent_mode: bool, env, capture_output: bool, line_handler: Callable[[str], None]) -> List[str]:
         try:
             merged_env = None
             if env is not None:
@@ -47,7 +56,7 @@ class Utils:
                         output.append(line)
 
                     if silent_mode is False:
-                        print(line)
+                        (line_handler or print)(line)
 
             if process.wait() != 0:
                 raise RuntimeError
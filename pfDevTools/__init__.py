@@ -2,33 +2,65 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-import sys
-
-from .pfCommand.Clean import Clean
-from .pfCommand.Clone import Clone
-from .pfCommand.Convert import Convert
-from .pfCommand.Delete import Delete
-from .pfCommand.DryRun import DryRun
-from .pfCommand.Eject import Eject
-from .pfCommand.Install import Install
-from .pfCommand.Make import Make
-from .pfCommand.Package import Package
-from .pfCommand.Qfs import Qfs
-from .pfCommand.Reverse import Reverse
+import importlib
 
+from .BuildMetrics import BuildMetrics
 from .CoreConfig import CoreConfig
+from .CoreConfig import CoreConfigValues
 from .Git import Git
+from .Inventory import Inventory
+from .Manifest import Manifest
 from .Paths import Paths
-from .SCons import SConsEnvironment
+from .Profiler import Profiler
+from .RepoCache import RepoCache
+from .Resources import Resources
+from .Toolchain import Toolchain
 from .Utils import Utils
 
-from semver import Version
-
 from .__about__ import __version__
 
+# -- These are only imported when first used so that importing pfDevTools, or running a pf command, stays fast.
+_lazy_imports = {'Clean': '.pfCommand.Clean',
+                 'Clone': '.pfCommand.Clone',
+                 'Convert': '.pfCommand.Convert',
+                 'Daemon': '.pfCommand.Daemon',
+                 'Delete': '.pfCommand.Delete',
+                 'DryRun': '.pfCommand.DryRun',
+                 'Eject': '.pfCommand.Eject',
+                 'Install': '.pfCommand.Install',
+                 'ListCores': '.pfCommand.ListCores',
+                 'Make': '.pfCommand.Make',
+                 'MakeAll': '.pfCommand.MakeAll',
+                 'Package': '.pfCommand.Package',
+                 'Qfs': '.pfCommand.Qfs',
+                 'Reverse': '.pfCommand.Reverse',
+                 'Server': '.pfCommand.Server',
+                 'Verify': '.pfCommand.Verify',
+                 'Watch': '.pfCommand.Watch',
+                 'CompileFarm': '.CompileFarm',
+                 'FileWatcher': '.FileWatcher',
+                 'SConsEnvironment': '.SCons'}
+
+
+def __getattr__(name: str):
+    module_name = _lazy_imports.get(name, None)
+    if module_name is None:
+        raise AttributeError(f'module \'{__name__}\' has no attribute \'{name}\'')
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_lazy_imports.keys()))
+
 
 # --- Makes sure current pfDevTools versions is supported
 def requires(version: str) -> bool:
+    from semver import Version
+
     current = Version.parse(__version__, optional_minor_and_patch=True)
     required = Version.parse(version, optional_minor_and_patch=True)
 
@@ -2,7 +2,7 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-import pfDevTools.Utils
+import pfDevTools.SCons
 
 
 # -- Classes
@@ -16,7 +16,7 @@ class Clean:
             raise RuntimeError('Invalid arguments. Maybe start with `pf --help?')
 
     def run(self) -> None:
-        pfDevTools.Utils.shellCommand('scons -c -Q -s')
+        pfDevTools.SCons.runSCons(['-c', '-Q', '-s'])
 
     @classmethod
     def name(cls) -> str:
@@ -5,6 +5,7 @@
 import os
 import pfDevTools.Utils
 import pfDevTools.Git
+import pfDevTools.RepoCache
 
 from pfDevTools.Exceptions import ArgumentError
 
@@ -41,6 +42,11 @@ class Clone:
 
         print(f'Cloning core template in \'{self._destination_folder}\'.')
 
+        if pfDevTools.RepoCache.isEnabled():
+            # -- The cache keeps a local mirror of the repo so we only go to the network when the tag is not cached yet.
+            pfDevTools.RepoCache(self._url).exportTo(self._destination_folder, self._tag_name)
+            return
+
         pfDevTools.Git(self._url).cloneIn(self._destination_folder, self._tag_name)
 
         git_folder = os.path.join(self._destination_folder, '.git')
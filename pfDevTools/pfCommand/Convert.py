@@ -4,8 +4,6 @@
 
 import os
 
-from PIL import Image
-
 
 # -- Classes
 class Convert:
@@ -26,32 +24,37 @@ class Convert:
             raise RuntimeError('File \'' + self._img_filename + '\' does not exist.')
 
     def run(self) -> None:
+        from PIL import Image
+        from PIL import ImageChops
+        from PIL import ImageMath
+
         print('Reading \'' + self._img_filename + '\'.')
         img = Image.open(self._img_filename).convert("RGB")
 
-        pixels = img.load()
+        red, green, blue = img.split()
+        if ImageChops.difference(red, green).getbbox() is not None or ImageChops.difference(red, blue).getbbox() is not None:
+            print('WARNING: Image is not greyscale, results may be incorrect.')
 
-        byte_data = []
-        warned_against_greyscale = False
+        # -- Source image should be greyscale but in case it isn't, we average RBB here to convert it.
+        # -- Bands are added and divided as 32-bit integers so this truncates just like int((r + g + b) / 3) would.
+        lambda_eval = getattr(ImageMath, 'lambda_eval', None)
+        if lambda_eval is not None:
+            brightness = lambda_eval(lambda args: args['convert']((args['r'] + args['g'] + args['b']) / 3, 'L'), r=red, g=green, b=blue)
+        else:
+            brightness = ImageMath.eval('convert((r + g + b) / 3, "L")', r=red, g=green, b=blue)
 
         # -- Analog Pocket Image Format is 16-bit monochrome stored rotated 90 degrees counter-clockwise.
-        for x in range(img.width - 1, -1, -1):
-            for y in range(0, img.height):
-                pixel = pixels[x, y]
-                if warned_against_greyscale is False and ((pixel[0] != pixel[1]) or (pixel[0] != pixel[2])):
-                    print('WARNING: Image is not greyscale, results may be incorrect.')
-                    warned_against_greyscale = True
-
-                # -- Each pixel is 16 bits. The brightness is stored in the upper 8 bits.
-                # -- A fully on pixel value is 0xFF00. A fully off pixel value is 0x0000.
-                # -- Source image should be greyscale but in case it isn't, we average RBB here to convert it.
-                byte_data.append(int((pixel[0] + pixel[1] + pixel[2]) / 3))
-                byte_data.append(0x00)
+        brightness = brightness.transpose(Image.Transpose.ROTATE_90)
+
+        # -- Each pixel is 16 bits. The brightness is stored in the upper 8 bits.
+        # -- A fully on pixel value is 0xFF00. A fully off pixel value is 0x0000.
+        pixel_data = brightness.tobytes()
+        byte_data = bytearray(len(pixel_data) * 2)
+        byte_data[0::2] = pixel_data
 
         print('Writing \'' + self._bin_filename + '\'.')
-        output_file = open(self._bin_filename, 'wb')
-        output_file.write(bytearray(byte_data))
-        output_file.close()
+        with open(self._bin_filename, 'wb') as output_file:
+            output_file.write(byte_data)
 
     @classmethod
     def name(cls) -> str:
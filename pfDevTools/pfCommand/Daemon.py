@@ -0,0 +1,379 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import sys
+import json
+import time
+import signal
+import select
+import socket
+import importlib
+import threading
+import contextlib
+import socketserver
+import pfDevTools
+
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from pfDevTools.__about__ import __version__
+from pfDevTools.Exceptions import ArgumentError
+
+
+# -- Classes
+class _ForkingUnixStreamServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    def service_actions(self):
+        super().service_actions()
+
+        Daemon._readParsedConfigs()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # -- This runs in a child process forked from the warm daemon process.
+        try:
+            request: Dict = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+
+        Daemon._handleRequest(request, self.request)
+
+
+class Daemon:
+    """A tool to keep a warm pf process around and run other pf invocations' commands in it."""
+
+    # -- Everything the daemon sends back is the command's output followed by one of these trailers.
+    _exit_trailer: bytes = b'\0pf-exit:'
+    _fallback_trailer: bytes = b'\0pf-fallback'
+
+    # -- Only the variables pf reads are sent to the daemon, along with the ones starting with PF_. Everything else,
+    # -- like credentials, stays in the client's environment and commands get the daemon's own instead.
+    _forwarded_variables: List[str] = ['PATH', 'HOME']
+
+    # -- Modules imported ahead of time so that commands forked from the daemon don't pay for them.
+    _warm_modules: List[str] = ['SCons.Script', 'SCons.Environment', 'PIL.Image', 'semver', 'zipfile',
+                                'pfDevTools.OpenFPGACore', 'pfDevTools.SCons', 'pfDevTools.pfCommand.__main__']
+
+    # -- Commands tell the daemon which config files they parsed, through this pipe, so that it parses them too and the
+    # -- next commands forked from it inherit them, see CoreConfig._parsed_configs.
+    _parsed_configs_pipe: Optional[Tuple[int, int]] = None
+    _parsed_configs_data: bytes = b''
+
+    def __init__(self, arguments):
+        """Constructor based on command line arguments."""
+
+        if len(arguments) != 1 or arguments[0] not in ('start', 'stop', 'status'):
+            raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+
+        if not Daemon.isSupported():
+            raise RuntimeError('The pf daemon is only supported on macOS and Linux right now.')
+
+        self._action: str = arguments[0]
+
+    @classmethod
+    def isSupported(cls) -> bool:
+        return os.name == 'posix' and hasattr(socket, 'AF_UNIX')
+
+    @classmethod
+    def _isOwnedByUser(cls, path: str) -> bool:
+        # -- Also makes sure nobody else can get in, or replace the socket, if this is the socket's folder.
+        info = os.lstat(path)
+        return info.st_uid == os.getuid() and (not os.path.isdir(path) or (info.st_mode & 0o077) == 0)
+
+    @classmethod
+    def _connect(cls) -> Optional[socket.socket]:
+        socket_file = pfDevTools.Paths.daemonSocketFile()
+        if not os.path.exists(socket_file):
+            return None
+
+        # -- A socket put there by another user would get our environment so it is never used.
+        if not Daemon._isOwnedByUser(os.path.dirname(socket_file)) or not Daemon._isOwnedByUser(socket_file):
+            print(f'Ignoring pf daemon socket \'{socket_file}\' since it is not only accessible by the current user.', file=sys.stderr)
+            return None
+
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(socket_file)
+        except OSError:
+            connection.close()
+            return None
+
+        return connection
+
+    @classmethod
+    def _sendRequest(cls, connection: socket.socket, request: Dict) -> Optional[int]:
+        connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+
+        output = sys.stdout.buffer
+        data = b''
+
+        while True:
+            chunk = connection.recv(65536)
+            if len(chunk) == 0:
+                break
+
+            # -- Anything after the last null byte could be the start of the trailer so we hold on to it.
+            data += chunk
+            trailer_start = data.rfind(b'\0')
+            if trailer_start < 0:
+                output.write(data)
+                data = b''
+            else:
+                output.write(data[:trailer_start])
+                data = data[trailer_start:]
+
+            output.flush()
+
+        if data.startswith(Daemon._fallback_trailer):
+            return None
+
+        if data.startswith(Daemon._exit_trailer):
+            with contextlib.suppress(ValueError):
+                return int(data[len(Daemon._exit_trailer):].strip())
+
+        output.write(data)
+        output.flush()
+
+        print('The pf daemon did not finish running this command.')
+        return 1
+
+    @classmethod
+    def _forwardedEnvironment(cls) -> Dict[str, str]:
+        return {name: value for name, value in os.environ.items() if name.startswith('PF_') or name in Daemon._forwarded_variables}
+
+    @classmethod
+    def forward(cls, arguments: List[str]) -> Optional[int]:
+        # -- Returns the exit code of the command if the daemon ran it, None if it needs to be run locally.
+        if not Daemon.isSupported() or os.environ.get('PF_NO_DAEMON', None) is not None:
+            return None
+
+        commands = [argument for argument in arguments if not argument.startswith('-')]
+        if len(commands) == 0 or commands[0] == Daemon.name():
+            return None
+
+        connection = Daemon._connect()
+        if connection is None:
+            return None
+
+        try:
+            return Daemon._sendRequest(connection, {'type': 'run',
+                                                    'version': __version__,
+                                                    'arguments': arguments,
+                                                    'cwd': os.getcwd(),
+                                                    'environment': Daemon._forwardedEnvironment()})
+        except KeyboardInterrupt:
+            # -- Closing the connection tells the daemon to interrupt the command.
+            print('Execution interrupted by user.')
+            return 1
+        finally:
+            connection.close()
+
+    @classmethod
+    def _watchForDisconnection(cls, connection: socket.socket, finished: threading.Event) -> None:
+        # -- Clients never send anything after their request so this only returns when they go away.
+        with contextlib.suppress(OSError):
+            connection.recv(1)
+
+        if not finished.is_set():
+            os.kill(os.getpid(), signal.SIGINT)
+
+    @classmethod
+    def _runCommand(cls, request: Dict, connection: socket.socket) -> int:
+        os.chdir(request['cwd'])
+
+        # -- The PF_ variables the client didn't set should not come from the daemon's environment either.
+        for name in [name for name in os.environ if name.startswith('PF_')]:
+            del os.environ[name]
+
+        os.environ.update({name: value for name, value in request['environment'].items() if name.startswith('PF_') or name in Daemon._forwarded_variables})
+        os.environ['PF_NO_DAEMON'] = '1'
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(connection.fileno(), sys.stdout.fileno())
+        os.dup2(connection.fileno(), sys.stderr.fileno())
+
+        finished = threading.Event()
+        threading.Thread(target=Daemon._watchForDisconnection, args=(connection, finished), daemon=True).start()
+
+        exit_code = 0
+        try:
+            sys.argv = ['pf'] + request['arguments']
+            importlib.import_module('pfDevTools.pfCommand.__main__').main()
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except KeyboardInterrupt:
+            exit_code = 1
+        finally:
+            finished.set()
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+        return exit_code
+
+    @classmethod
+    def _handleRequest(cls, request: Dict, connection: socket.socket) -> None:
+        request_type = request.get('type', None)
+
+        if request_type == 'run':
+            if request.get('version', None) != __version__:
+                connection.sendall(Daemon._fallback_trailer)
+                return
+
+            parsed_configs = dict(pfDevTools.CoreConfig._parsed_configs)
+            exit_code = Daemon._runCommand(request, connection)
+            Daemon._reportParsedConfigs(request['cwd'], parsed_configs)
+        elif request_type == 'status':
+            connection.sendall(f'pf daemon v{__version__} is running with pid {os.getppid()}.\n'.encode('utf-8'))
+            exit_code = 0
+        elif request_type == 'stop':
+            connection.sendall('Stopping pf daemon.\n'.encode('utf-8'))
+            os.kill(os.getppid(), signal.SIGTERM)
+            exit_code = 0
+        else:
+            connection.sendall(f'Unknown pf daemon request \'{request_type}\'.\n'.encode('utf-8'))
+            exit_code = 1
+
+        connection.sendall(Daemon._exit_trailer + f'{exit_code}\n'.encode('utf-8'))
+
+    @classmethod
+    def _reportParsedConfigs(cls, cwd: str, previous_configs: Dict) -> None:
+        if Daemon._parsed_configs_pipe is None:
+            return
+
+        for key, parsed in pfDevTools.CoreConfig._parsed_configs.items():
+            if previous_configs.get(key, None) is parsed:
+                continue
+
+            # -- Writes this small are atomic so lines from commands finishing at the same time never get mixed up.
+            line = json.dumps({'cwd': cwd, 'path': key[0], 'file': key[1]}).encode('utf-8') + b'\n'
+            if len(line) <= select.PIPE_BUF:
+                os.write(Daemon._parsed_configs_pipe[1], line)
+
+    @classmethod
+    def _readParsedConfigs(cls) -> None:
+        if Daemon._parsed_configs_pipe is None:
+            return
+
+        with contextlib.suppress(BlockingIOError):
+            while True:
+                data = os.read(Daemon._parsed_configs_pipe[0], 65536)
+                if len(data) == 0:
+                    break
+
+                Daemon._parsed_configs_data += data
+
+        *lines, Daemon._parsed_configs_data = Daemon._parsed_configs_data.split(b'\n')
+
+        # -- Config file names are kept as given, relative to the command's folder.
+        daemon_folder = os.getcwd()
+        for line in lines:
+            try:
+                config = json.loads(line)
+                os.chdir(config['cwd'])
+                if os.path.abspath(config['file']) == config['path']:
+                    pfDevTools.CoreConfig(config['file'])
+            except Exception:
+                # -- The command that parsed it first already reported any error.
+                pass
+            finally:
+                os.chdir(daemon_folder)
+
+    @classmethod
+    def _warmUp(cls) -> None:
+        start_time = time.monotonic()
+
+        for module_name in Daemon._warm_modules:
+            try:
+                importlib.import_module(module_name)
+            except ImportError:
+                pass
+
+        # -- Toolchain probe results are remembered and inherited by each command forked from the daemon.
+        try:
+            toolchain = pfDevTools.Toolchain.fromEnvironment()
+            if not toolchain.probe():
+                print(f'Toolchain \'{toolchain.name}\' not available yet, it will be probed for each build.')
+        except RuntimeError as e:
+            print(e)
+
+        print(f'Warmed up in {time.monotonic() - start_time:.2f}s.')
+
+    @classmethod
+    def _onTerminate(cls, signal_number, frame) -> None:
+        raise SystemExit(0)
+
+    def _start(self) -> None:
+        socket_file = pfDevTools.Paths.daemonSocketFile()
+
+        connection = Daemon._connect()
+        if connection is not None:
+            connection.close()
+            raise RuntimeError('The pf daemon is already running.')
+
+        # -- Any socket file left at this point is from a daemon that did not exit cleanly.
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(socket_file)
+
+        socket_folder = os.path.dirname(socket_file)
+        os.makedirs(socket_folder, mode=0o700, exist_ok=True)
+        if not Daemon._isOwnedByUser(socket_folder):
+            raise RuntimeError(f'Folder \'{socket_folder}\' should only be accessible by the current user to run the pf daemon.')
+
+        Daemon._warmUp()
+
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(read_fd, False)
+        Daemon._parsed_configs_pipe = (read_fd, write_fd)
+
+        # -- The socket is created only accessible by the current user.
+        previous_umask = os.umask(0o077)
+        try:
+            server = _ForkingUnixStreamServer(socket_file, _RequestHandler)
+        finally:
+            os.umask(previous_umask)
+
+        signal.signal(signal.SIGTERM, Daemon._onTerminate)
+
+        print(f'pf daemon v{__version__} listening on \'{socket_file}\'. Press Ctrl-C to stop.')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(socket_file)
+
+            print('pf daemon stopped.')
+
+    def run(self) -> None:
+        if self._action == 'start':
+            self._start()
+            return
+
+        connection = Daemon._connect()
+        if connection is None:
+            print('The pf daemon is not running.')
+            return
+
+        try:
+            exit_code = Daemon._sendRequest(connection, {'type': self._action})
+        finally:
+            connection.close()
+
+        if exit_code != 0:
+            raise RuntimeError
+
+    @classmethod
+    def name(cls) -> str:
+        return 'daemon'
+
+    @classmethod
+    def usage(cls) -> None:
+        print('   daemon start|stop|status              - Start, stop or query a warm pf process that runs other pf commands.')
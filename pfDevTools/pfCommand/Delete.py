@@ -20,7 +20,7 @@ class Delete:
         nb_of_arguments = len(arguments)
         if nb_of_arguments == 2:
             self._volume_path = arguments[1]
-            arguments = arguments[:0]
+            arguments = arguments[:1]
             nb_of_arguments -= 1
         else:
             self._volume_path = pfDevTools.CoreConfig.coreInstallVolumePath()
@@ -2,7 +2,7 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-import pfDevTools.Utils
+import pfDevTools.SCons
 
 
 # -- Classes
@@ -16,7 +16,7 @@ class DryRun:
             raise RuntimeError('Invalid arguments. Maybe start with `pf --help?')
 
     def run(self) -> None:
-        pfDevTools.Utils.shellCommand('scons --dry-run --tree=all --debug=explain')
+        pfDevTools.SCons.runSCons(['--dry-run', '--tree=all', '--debug=explain'])
 
     @classmethod
     def name(cls) -> str:
@@ -3,14 +3,13 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import os
-import zipfile
+import shutil
 import tempfile
 import contextlib
-import pfDevTools.Utils
+import pfDevTools
 import pfDevTools.CoreConfig
 
 from sys import platform
-from distutils.dir_util import copy_tree
 
 
 # -- Classes
@@ -27,7 +26,7 @@ class Install:
         if nb_of_arguments != 0:
             if nb_of_arguments == 2:
                 self._volume_path = arguments[1]
-                arguments = arguments[:0]
+                arguments = arguments[:1]
                 nb_of_arguments -= 1
             else:
                 self._volume_path = pfDevTools.CoreConfig.coreInstallVolumePath()
@@ -59,13 +58,27 @@ class Install:
 
     def run(self) -> None:
         if self._volume_path is None:
-            pfDevTools.Utils.shellCommand('scons -Q -s install')
+            from pfDevTools.SCons import runSCons
+
+            runSCons(['-Q', '-s'], targets=['install'])
             return
 
+        import zipfile
+
+        # -- Only the small manifest file needs to be read back from the volume to know if the core is already installed.
+        with zipfile.ZipFile(self._zip_filename, 'r') as zip_ref:
+            manifest = pfDevTools.Manifest.fromZip(zip_ref)
+
+        if manifest is not None:
+            installed_manifest = pfDevTools.Manifest.installedOn(self._volume_path, manifest.core_name)
+            if installed_manifest is not None and installed_manifest.buildHash() == manifest.buildHash():
+                print(f'Core \'{manifest.core_name}\' version {manifest.version} is already up to date on volume.')
+                return
+
         # -- In a temporary folder.
         with tempfile.TemporaryDirectory() as tmp_dir:
             # -- Unzip the file.
-            with zipfile.ZipFile(self._zip_filename, 'r') as zip_ref:
+            with pfDevTools.Profiler.span('unzip core'), zipfile.ZipFile(self._zip_filename, 'r') as zip_ref:
                 zip_ref.extractall(tmp_dir)
 
             # -- Copy core files
@@ -77,7 +90,14 @@ class Install:
             if not os.path.isdir(core_src_folder):
                 raise RuntimeError('Cannot find \'' + core_src_folder + '\' in the core release zip file.')
 
-            copy_tree(core_src_folder, core_dest_folder)
+            # -- The installed manifest is removed before anything is copied and the new one is copied last, so that an
+            # -- interrupted install never looks up to date, even to the core that was installed before it.
+            if manifest is not None:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(self._volume_path, *pfDevTools.Manifest.manifestPath(manifest.core_name).split('/')))
+
+            with pfDevTools.Profiler.span('copy core files'):
+                shutil.copytree(core_src_folder, core_dest_folder, dirs_exist_ok=True, ignore=shutil.ignore_patterns('manifest.json'))
 
             # -- Copy platform files
             print('Copying platforms files...')
@@ -88,7 +108,12 @@ class Install:
             if not os.path.isdir(platforms_src_folder):
                 raise RuntimeError('Cannot find \'' + platforms_src_folder + '\' in the core release zip file.')
 
-            copy_tree(platforms_src_folder, platforms_dest_folder)
+            with pfDevTools.Profiler.span('copy platforms files'):
+                shutil.copytree(platforms_src_folder, platforms_dest_folder, dirs_exist_ok=True)
+
+            if manifest is not None:
+                manifest_path = pfDevTools.Manifest.manifestPath(manifest.core_name).split('/')
+                shutil.copyfile(os.path.join(tmp_dir, *manifest_path), os.path.join(self._volume_path, *manifest_path))
 
     @classmethod
     def name(cls) -> str:
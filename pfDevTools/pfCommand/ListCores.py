@@ -0,0 +1,66 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import pfDevTools
+
+from typing import List
+
+
+# -- Classes
+class ListCores:
+    """A tool to list the cores installed on a given volume (SD card or Pocket in USB access mode)."""
+
+    def __init__(self, arguments):
+        """Constructor based on command line arguments."""
+
+        nb_of_arguments = len(arguments)
+        if nb_of_arguments == 0:
+            self._volume_path = pfDevTools.CoreConfig.coreInstallVolumePath()
+        elif nb_of_arguments == 1:
+            self._volume_path = arguments[0]
+        else:
+            raise RuntimeError('Invalid arguments. Maybe start with `pf --help?')
+
+    @classmethod
+    def _sizeAsString(cls, size: int) -> str:
+        if size >= 1024 * 1024:
+            return f'{size / (1024 * 1024):.1f} MiB'
+
+        return f'{size / 1024:.1f} KiB'
+
+    def run(self) -> None:
+        inventory = pfDevTools.Inventory(self._volume_path)
+        inventory.scan()
+
+        if len(inventory.cores) == 0:
+            print(f'No cores installed on {self._volume_path}.')
+            return
+
+        print(f'   {"core":<32} {"version":<10} {"date":<12} {"bitstream":>10}   platform')
+
+        for name in sorted(inventory.cores.keys(), key=str.lower):
+            core = inventory.cores[name]
+
+            platforms: List[str] = []
+            for platform_id in core['platform_ids']:
+                platform = inventory.platforms.get(platform_id, None)
+                description = platform_id if platform is None or platform['name'] is None else f'{platform_id} ({platform["name"]})'
+                if platform is None:
+                    description += ' [missing]'
+
+                shared_with = [other for other in inventory.coresUsingPlatform(platform_id) if other != name]
+                if len(shared_with) != 0:
+                    description += f' shared with {", ".join(shared_with)}'
+
+                platforms.append(description)
+
+            print(f'   {name:<32} {core["version"] or "?":<10} {core["date"] or "?":<12} {ListCores._sizeAsString(core["bitstream_size"]):>10}   {", ".join(platforms)}')
+
+    @classmethod
+    def name(cls) -> str:
+        return 'list'
+
+    @classmethod
+    def usage(cls) -> None:
+        print('   list <dest_volume>                    - List cores installed on volume.')
@@ -2,7 +2,12 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-import pfDevTools.Utils
+import pfDevTools.SCons
+
+from typing import Dict
+from typing import List
+
+from pfDevTools.Exceptions import ArgumentError
 
 
 # -- Classes
@@ -12,11 +17,30 @@ class Make:
     def __init__(self, arguments):
         """Constructor based on command line arguments."""
 
-        if len(arguments) != 0:
-            raise RuntimeError('Invalid arguments. Maybe start with `pf --help?')
+        self._jobs: int = None
+        self._variables: Dict[str, str] = {}
+        self._targets: List[str] = []
+
+        for argument in arguments:
+            if argument.startswith('jobs='):
+                try:
+                    self._jobs = int(argument[5:])
+                except ValueError:
+                    raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+
+                if self._jobs < 1:
+                    raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+            elif argument.startswith('decider='):
+                self._variables['PF_DECIDER'] = argument[8:]
+            elif '=' in argument:
+                # -- Anything else with an equal sign is passed on to the SConstruct file as a build variable.
+                name, value = argument.split('=', 1)
+                self._variables[name] = value
+            else:
+                self._targets.append(argument)
 
     def run(self) -> None:
-        pfDevTools.Utils.shellCommand('scons -Q -s')
+        pfDevTools.SCons.runSCons(['-Q', '-s'], targets=self._targets, jobs=self._jobs, variables=self._variables)
 
     @classmethod
     def name(cls) -> str:
@@ -24,4 +48,5 @@ class Make:
 
     @classmethod
     def usage(cls) -> None:
-        print('   make                                  - Make the local project.')
+        print('   make <jobs=N> <decider=name>          - Make the local project (optionally with N parallel jobs, a given')
+        print('        <name=value> <targets>             SCons decider, build variables and only the given targets).')
@@ -0,0 +1,173 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import sys
+import time
+import threading
+import subprocess
+import pfDevTools
+import concurrent.futures
+
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from pfDevTools.Exceptions import ArgumentError
+
+
+# -- Classes
+class MakeAll:
+    """A tool to make all the projects found in a folder, as many at a time as CPUs and memory allow."""
+
+    # -- Roughly what one Quartus compile of a Cyclone V core needs, used to find how many compiles fit in the memory budget.
+    _memory_per_compile_in_gb: float = 4.0
+
+    # -- Folders that never contain projects.
+    _ignored_folders: List[str] = ['_build', 'node_modules', '__pycache__']
+
+    def __init__(self, arguments):
+        """Constructor based on command line arguments."""
+
+        self._root_folder: str = None
+        self._nb_of_cpus: int = pfDevTools.Resources.availableCPUs()
+
+        # -- None when the available memory can't be found, builds are then only budgeted on CPUs.
+        available_memory = pfDevTools.Resources.availableMemory()
+        self._memory_in_gb: Optional[float] = available_memory / (1024 * 1024 * 1024) if available_memory != 0 else None
+
+        self._nb_of_jobs: int = None
+        self._variables: List[str] = []
+
+        for argument in arguments:
+            try:
+                if argument.startswith('cpus='):
+                    self._nb_of_cpus = int(argument[5:])
+                elif argument.startswith('memory='):
+                    self._memory_in_gb = float(argument[7:])
+                elif argument.startswith('jobs='):
+                    self._nb_of_jobs = int(argument[5:])
+                elif '=' in argument:
+                    # -- Anything else with an equal sign is passed on to each project's build.
+                    self._variables.append(argument)
+                elif self._root_folder is None:
+                    self._root_folder = argument
+                else:
+                    raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+            except ValueError:
+                raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+
+        if self._nb_of_cpus < 1 or (self._nb_of_jobs is not None and self._nb_of_jobs < 1) or (self._memory_in_gb is not None and self._memory_in_gb <= 0):
+            raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+
+        if self._root_folder is None:
+            self._root_folder = '.'
+
+        if not os.path.isdir(self._root_folder):
+            raise ArgumentError('Folder \'' + self._root_folder + '\' does not exist.')
+
+        self._output_lock = threading.Lock()
+
+    def _findProjects(self) -> List[str]:
+        projects: List[str] = []
+
+        for root, dirs, files in os.walk(self._root_folder):
+            if 'SConstruct' in files:
+                projects.append(root)
+
+                # -- A project's own folders are not searched for more projects.
+                dirs[:] = []
+                continue
+
+            dirs[:] = sorted(folder for folder in dirs if not folder.startswith('.') and folder not in MakeAll._ignored_folders)
+
+        return sorted(projects)
+
+    def _budgetFor(self, nb_of_projects: int) -> Tuple[int, int, Optional[float]]:
+        # -- Returns how many projects are built at once and the CPUs and memory, if known, each of their compiles can use.
+        nb_of_jobs = self._nb_of_jobs
+        if nb_of_jobs is None:
+            nb_of_jobs = max(1, self._nb_of_cpus // 2)
+            if self._memory_in_gb is not None:
+                nb_of_jobs = min(nb_of_jobs, max(1, int(self._memory_in_gb // MakeAll._memory_per_compile_in_gb)))
+
+        nb_of_jobs = max(1, min(nb_of_jobs, nb_of_projects, self._nb_of_cpus))
+
+        return nb_of_jobs, self._nb_of_cpus // nb_of_jobs, (self._memory_in_gb / nb_of_jobs if self._memory_in_gb is not None else None)
+
+    @classmethod
+    def _describe(cls, cpus: int, memory_in_gb: Optional[float]) -> str:
+        return f'{cpus} CPUs' + (f' and {memory_in_gb:.1f} GB' if memory_in_gb is not None else '')
+
+    def _projectName(self, project: str) -> str:
+        name = os.path.relpath(project, self._root_folder)
+        return os.path.basename(os.path.abspath(project)) if name == '.' else name
+
+    def _build(self, project: str, cpus: int, memory_in_gb: Optional[float]) -> Tuple[int, float]:
+        name = self._projectName(project)
+
+        environment = dict(os.environ)
+        environment['PF_COMPILE_CPUS'] = str(cpus)
+        if memory_in_gb is not None:
+            environment['PF_COMPILE_MEMORY'] = f'{memory_in_gb:.1f}'
+        environment['PF_NO_UPDATE_CHECK'] = '1'
+
+        start_time = time.monotonic()
+
+        with self._output_lock:
+            print(f'{name}: building with {MakeAll._describe(cpus, memory_in_gb)}.')
+
+        process = subprocess.Popen([sys.executable, '-m', 'pfDevTools.pfCommand.__main__', 'make', f'jobs={cpus}'] + self._variables,
+                                   cwd=project, env=environment, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+        # -- Each line is prefixed with the project it comes from since several builds share the same output.
+        for line in iter(process.stdout.readline, b''):
+            with self._output_lock:
+                print(f'{name}: {line.decode("utf-8", errors="replace").rstrip()}')
+
+        return process.wait(), time.monotonic() - start_time
+
+    def run(self) -> None:
+        projects = self._findProjects()
+        if len(projects) == 0:
+            raise RuntimeError(f'Could not find any projects in \'{self._root_folder}\'.')
+
+        nb_of_jobs, cpus, memory_in_gb = self._budgetFor(len(projects))
+        print(f'Building {len(projects)} projects, {nb_of_jobs} at a time, using {MakeAll._describe(self._nb_of_cpus, self._memory_in_gb)}.')
+
+        start_time = time.monotonic()
+        results: Dict[str, Tuple[int, float]] = {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=nb_of_jobs) as executor:
+            futures = {executor.submit(self._build, project, cpus, memory_in_gb): project for project in projects}
+
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+
+        print('')
+        print('Build summary:')
+
+        failed_projects: List[str] = []
+        for project in projects:
+            exit_code, build_time = results[project]
+            name = self._projectName(project)
+
+            print(f'   {name:<40} {"ok" if exit_code == 0 else "FAILED":<8} {build_time:8.1f}s')
+            if exit_code != 0:
+                failed_projects.append(name)
+
+        print(f'   {len(projects) - len(failed_projects)} of {len(projects)} projects built in {time.monotonic() - start_time:.1f}s.')
+
+        if len(failed_projects) != 0:
+            raise RuntimeError(f'Failed to build {", ".join(failed_projects)}.')
+
+    @classmethod
+    def name(cls) -> str:
+        return 'makeall'
+
+    @classmethod
+    def usage(cls) -> None:
+        print('   makeall <folder> <cpus=N> <memory=GB> - Make all projects found in folder, as many at a time as N CPUs')
+        print('           <jobs=N> <name=value>           and GB of memory allow (or N at a time), with build variables.')
@@ -2,15 +2,27 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import io
 import os
+import json
+import time
 import shutil
-import zipfile
+import tempfile
+import importlib
+import threading
+import contextlib
 import pfDevTools
+import concurrent.futures
 
+from typing import Callable
+from typing import Dict
 from typing import List
+from typing import Tuple
 from pathlib import Path
 from datetime import date
 
+from pfDevTools.Exceptions import ArgumentError
+
 
 # -- Classes
 class Package:
@@ -19,147 +31,207 @@ class Package:
     def __init__(self, arguments):
         """Constructor based on command line arguments."""
 
-        if len(arguments) != 3:
+        self._catalogue: List[Tuple[str, str]] = []
+        self._combined_filename: str = None
+        self._nb_of_workers: int = pfDevTools.Resources.availableCPUs()
+        self._artifact_cache_folder: str = None
+
+        positional_arguments: List[str] = []
+        for argument in arguments:
+            if argument.startswith('catalogue='):
+                self._catalogue += Package._readCatalogue(argument[10:])
+            elif argument.startswith('combined='):
+                self._combined_filename = argument[9:]
+            elif argument.startswith('jobs='):
+                try:
+                    self._nb_of_workers = int(argument[5:])
+                except ValueError:
+                    raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+
+                if self._nb_of_workers < 1:
+                    raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+            else:
+                positional_arguments.append(argument)
+
+        # -- Arguments are config and bitstream file pairs followed by the destination folder.
+        if len(positional_arguments) == 0 or (len(positional_arguments) % 2) != 1:
             raise RuntimeError('Invalid arguments. Maybe start with `pf --help?')
 
-        self._config = pfDevTools.CoreConfig(arguments[0])
-        self._bitstream_file: str = arguments[1]
-        self._destination_folder: str = arguments[2]
+        for index in range(0, len(positional_arguments) - 1, 2):
+            self._catalogue.append((positional_arguments[index], positional_arguments[index + 1]))
+
+        if len(self._catalogue) == 0:
+            raise RuntimeError('Invalid arguments. Maybe start with `pf --help?')
+
+        self._config = pfDevTools.CoreConfig(self._catalogue[0][0])
+        self._bitstream_file: str = self._catalogue[0][1]
+        self._destination_folder: str = positional_arguments[-1]
         self._core_folder = os.path.join(self._destination_folder, '_core')
         self._today = str(date.today())
 
-    def _generateDefinitionFiles(self, cores_folder, platforms_folder) -> None:
-        output_filename = os.path.join(cores_folder, 'audio.json')
-        with open(output_filename, 'w') as out_file:
-            out_file.write('{\n')
-            out_file.write('  "audio": {\n')
-            out_file.write('    "magic": "APF_VER_1"\n')
-            out_file.write('  }\n')
-            out_file.write('}\n')
-
-        output_filename = os.path.join(cores_folder, 'data.json')
-        with open(output_filename, 'w') as out_file:
-            out_file.write('{\n')
-            out_file.write('  "data": {\n')
-            out_file.write('    "magic": "APF_VER_1",\n')
-            out_file.write('    "data_slots": []\n')
-            out_file.write('  }\n')
-            out_file.write('}\n')
-
-        output_filename = os.path.join(cores_folder, 'input.json')
-        with open(output_filename, 'w') as out_file:
-            out_file.write('{\n')
-            out_file.write('  "input": {\n')
-            out_file.write('    "magic": "APF_VER_1",\n')
-            out_file.write('    "controllers": []\n')
-            out_file.write('  }\n')
-            out_file.write('}\n')
-
-        output_filename = os.path.join(cores_folder, 'variants.json')
-        with open(output_filename, 'w') as out_file:
-            out_file.write('{\n')
-            out_file.write('  "variants": {\n')
-            out_file.write('    "magic": "APF_VER_1",\n')
-            out_file.write('    "variant_list": []\n')
-            out_file.write('  }\n')
-            out_file.write('}\n')
-
-        output_filename = os.path.join(cores_folder, 'interact.json')
-        with open(output_filename, 'w') as out_file:
-            out_file.write('{\n')
-            out_file.write('  "interact": {\n')
-            out_file.write('    "magic": "APF_VER_1",\n')
-            out_file.write('    "variables": [],\n')
-            out_file.write('    "messages": []\n')
-            out_file.write('  }\n')
-            out_file.write('}\n')
-
-        output_filename = os.path.join(cores_folder, 'video.json')
-        with open(output_filename, 'w') as out_file:
-            out_file.write('{\n')
-            out_file.write('  "video": {\n')
-            out_file.write('    "magic": "APF_VER_1",\n')
-            out_file.write('    "scaler_modes": [\n')
-            out_file.write('      {\n')
-            out_file.write('        "width": %d,\n' % (self._config.videoWidth()))
-            out_file.write('        "height": %d,\n' % (self._config.videoHeight()))
-            out_file.write('        "aspect_w": %d,\n' % (self._config.videoAspectRatioWidth()))
-            out_file.write('        "aspect_h": %d,\n' % (self._config.videoAspectRatioHeight()))
-            out_file.write('        "rotation": %d,\n' % (self._config.videoRotation()))
-            out_file.write('        "mirror": %d\n' % (self._config.videoMirror()))
-            out_file.write('      }\n')
-            out_file.write('    ]\n')
-            out_file.write('  }\n')
-            out_file.write('}\n')
-
-        output_filename = os.path.join(platforms_folder, '%s.json' % (self._config.platformShortName()))
-        with open(output_filename, 'w') as out_file:
-            out_file.write('{\n')
-            out_file.write('  "platform": {\n')
-            out_file.write('    "category": "%s",\n' % (self._config.platformCategory()))
-            out_file.write('    "name": "%s",\n' % (self._config.platformName()))
-            out_file.write('    "year": %s,\n' % (self._today.split('-')[0]))
-            out_file.write('    "manufacturer": "%s"\n' % (self._config.authorName()))
-            out_file.write('  }\n')
-            out_file.write('}\n')
-
-        output_filename = os.path.join(cores_folder, 'core.json')
-        with open(output_filename, 'w') as out_file:
-            out_file.write('{\n')
-            out_file.write('  "core": {\n')
-            out_file.write('    "magic": "APF_VER_1",\n')
-            out_file.write('    "metadata": {\n')
-            out_file.write('      "platform_ids": ["%s"],\n' % (self._config.platformShortName()))
-            out_file.write('      "shortname": "%s",\n' % (self._config.platformShortName()))
-            out_file.write('      "description": "%s",\n' % (self._config.platformDescription()))
-            out_file.write('      "author": "%s",\n' % (self._config.authorName()))
-            out_file.write('      "url": "%s",\n' % (self._config.authorURL()))
-            out_file.write('      "version": "%s",\n' % (self._config.buildVersion()))
-            out_file.write('      "date_release": "%s"\n' % (self._today))
-            out_file.write('    },\n')
-            out_file.write('    "framework": {\n')
-            out_file.write('      "target_product": "Analogue Pocket",\n')
-            out_file.write('      "version_required": "1.1",\n')
-            out_file.write('      "sleep_supported": false,\n')
-            out_file.write('      "dock": {\n')
-            out_file.write('        "supported": true,\n')
-            out_file.write('        "analog_output": false\n')
-            out_file.write('      },\n')
-            out_file.write('      "hardware": {\n')
-            out_file.write('        "link_port": false,\n')
-            out_file.write('        "cartridge_adapter": -1\n')
-            out_file.write('      }\n')
-            out_file.write('    },\n')
-            out_file.write('    "cores": [\n')
-            out_file.write('      {\n')
-            out_file.write('        "name": "default",\n')
-            out_file.write('        "id": 0,\n')
-            out_file.write('        "filename": "%s.rbf_r"\n' % (self._config.platformShortName()))
-            out_file.write('      }\n')
-            out_file.write('    ]\n')
-            out_file.write('  }\n')
-            out_file.write('}\n')
-
-    def _convertImages(self, cores_folder, platforms_image_folder) -> None:
-        dest_bin_file = os.path.join(platforms_image_folder, '%s.bin' % (self._config.platformShortName()))
-        pfDevTools.Convert([self._config.platformImage(), dest_bin_file]).run()
-
-        dest_bin_file = os.path.join(cores_folder, 'icon.bin')
-        pfDevTools.Convert([self._config.authorIcon(), dest_bin_file]).run()
-
-    def _packageCore(self):
-        packaged_filename = os.path.abspath(os.path.join(self._destination_folder, self.packagedFilename()))
-        if os.path.exists(packaged_filename):
-            os.remove(packaged_filename)
+        self._stage_times: Dict[str, float] = {}
+        self._manifest_files: Dict[str, Tuple[str, int]] = {}
+
+    @classmethod
+    def _readCatalogue(cls, catalogue_filename: str) -> List[Tuple[str, str]]:
+        from pfDevTools.CoreConfig import tomllib
+
+        if not os.path.exists(catalogue_filename):
+            raise ArgumentError('Catalogue file \'' + catalogue_filename + '\' does not exist.')
+
+        with open(catalogue_filename, mode='rb') as fp:
+            catalogue = tomllib.load(fp)
+
+        # -- Paths in the catalogue are relative to the catalogue file itself.
+        catalogue_folder = os.path.dirname(catalogue_filename)
+        cores: List[Tuple[str, str]] = []
+
+        for entry in catalogue.get('core', []):
+            if not isinstance(entry, dict) or not isinstance(entry.get('config', None), str) or not isinstance(entry.get('bitstream', None), str):
+                raise RuntimeError(f'Each core in catalogue file \'{catalogue_filename}\' needs a config and a bitstream.')
+
+            cores.append((os.path.join(catalogue_folder, entry['config']), os.path.join(catalogue_folder, entry['bitstream'])))
+
+        return cores
+
+    def _coreDefinition(self) -> Dict:
+        config = self._config.values
+
+        return {'magic': 'APF_VER_1',
+                'metadata': {'platform_ids': [config.platform_short_name],
+                             'shortname': config.platform_short_name,
+                             'description': config.platform_description,
+                             'author': config.author_name,
+                             'url': config.author_url,
+                             'version': config.build_version,
+                             'date_release': self._today},
+                'framework': {'target_product': 'Analogue Pocket',
+                              'version_required': '1.1',
+                              'sleep_supported': False,
+                              'dock': {'supported': True,
+                                       'analog_output': False},
+                              'hardware': {'link_port': False,
+                                           'cartridge_adapter': -1}},
+                'cores': [{'name': 'default',
+                           'id': 0,
+                           'filename': f'{config.platform_short_name}.rbf_r'}]}
+
+    def _definitions(self) -> Dict[str, Dict]:
+        config = self._config.values
+
+        # -- Default content for each definition file, which anything given in the matching config section is added to.
+        definitions: Dict[str, Dict] = {'audio': {'magic': 'APF_VER_1'},
+                                        'data': {'magic': 'APF_VER_1',
+                                                 'data_slots': []},
+                                        'input': {'magic': 'APF_VER_1',
+                                                  'controllers': []},
+                                        'variants': {'magic': 'APF_VER_1',
+                                                     'variant_list': []},
+                                        'interact': {'magic': 'APF_VER_1',
+                                                     'variables': [],
+                                                     'messages': []},
+                                        'video': {'magic': 'APF_VER_1',
+                                                  'scaler_modes': config.video_scaler_modes},
+                                        'core': self._coreDefinition()}
+
+        for name, values in config.definitions.items():
+            definitions[name].update(values)
+
+        return definitions
+
+    def _writeJsonFile(self, filename: str, content: Dict) -> None:
+        with open(filename, 'w') as out_file:
+            out_file.write(json.dumps(content, indent=2) + '\n')
+
+    def _generateDefinitionFiles(self, cores_folder, platforms_folder) -> List[str]:
+        files: List[str] = []
+
+        for name, definition in self._definitions().items():
+            files.append(os.path.join(cores_folder, f'{name}.json'))
+            self._writeJsonFile(files[-1], {name: definition})
+
+        config = self._config.values
+        files.append(os.path.join(platforms_folder, f'{config.platform_short_name}.json'))
+        self._writeJsonFile(files[-1], {'platform': {'category': config.platform_category,
+                                                     'name': config.platform_name,
+                                                     'year': int(self._today.split('-')[0]),
+                                                     'manufacturer': config.author_name}})
+
+        return files
+
+    def _cachedArtifact(self, source_file: str, dest_file: str, create: Callable[[], None]) -> None:
+        # -- When packaging a whole catalogue, cores often share images, so what was created from the same content is reused.
+        if self._artifact_cache_folder is None:
+            create()
+            return
+
+        source_hash, _ = pfDevTools.Manifest.hashFile(source_file)
+        cached_file = os.path.join(self._artifact_cache_folder, source_hash + os.path.splitext(dest_file)[1])
+
+        if os.path.exists(cached_file):
+            shutil.copyfile(cached_file, dest_file)
+            return
+
+        create()
+
+        temp_file = f'{cached_file}.{os.getpid()}.{threading.get_ident()}'
+        shutil.copyfile(dest_file, temp_file)
+        os.replace(temp_file, cached_file)
+
+    def _reverseBitstream(self, cores_folder) -> List[str]:
+        bitstream_dest = os.path.join(cores_folder, '%s.rbf_r' % self._config.platformShortName())
+        self._cachedArtifact(self._bitstream_file, bitstream_dest, lambda: pfDevTools.Reverse([self._bitstream_file, bitstream_dest]).run())
+
+        return [bitstream_dest]
+
+    def _convertImage(self, image_file: str, dest_bin_file: str) -> List[str]:
+        self._cachedArtifact(image_file, dest_bin_file, lambda: pfDevTools.Convert([image_file, dest_bin_file]).run())
+
+        return [dest_bin_file]
+
+    def _copyInfoFile(self, cores_folder) -> List[str]:
+        dest_info = os.path.join(cores_folder, 'info.txt')
+        shutil.copyfile(self._config.platformInfoFile(), dest_info)
+
+        return [dest_info]
+
+    def _tasks(self, cores_folder, platforms_folder, platforms_image_folder) -> Dict[str, Callable[[], List[str]]]:
+        # -- None of these depend on each other. Each one returns the files it wrote so they can be zipped as soon as it is done.
+        tasks: Dict[str, Callable[[], List[str]]] = {'reverse bitstream': lambda: self._reverseBitstream(cores_folder),
+                                                     'generate definition files': lambda: self._generateDefinitionFiles(cores_folder, platforms_folder),
+                                                     'convert platform image': lambda: self._convertImage(self._config.platformImage(), os.path.join(platforms_image_folder, '%s.bin' % (self._config.platformShortName()))),
+                                                     'convert author icon': lambda: self._convertImage(self._config.authorIcon(), os.path.join(cores_folder, 'icon.bin'))}
+
+        if self._config.platformInfoFile() is not None:
+            tasks['copy info file'] = lambda: self._copyInfoFile(cores_folder)
+
+        return tasks
 
-        with zipfile.ZipFile(packaged_filename, 'w') as myzip:
-            for p in Path(self._core_folder).rglob('*'):
-                if os.path.isdir(p):
-                    continue
+    def _runTask(self, name: str, task: Callable[[], List[str]]) -> List[str]:
+        start_time = time.monotonic()
 
-                relative_path = p.relative_to(self._core_folder)
-                print('   adding \'' + str(relative_path) + '\'')
-                myzip.write(p, arcname=relative_path, compress_type=zipfile.ZIP_DEFLATED)
+        with pfDevTools.Profiler.span(name):
+            files = task()
+
+        self._stage_times[name] = time.monotonic() - start_time
+        return files
+
+    def _addToZip(self, zip_file, files: List[str]) -> None:
+        import zipfile
+
+        for file in files:
+            relative_path = Path(file).relative_to(self._core_folder).as_posix()
+            print('   adding \'' + relative_path + '\'')
+
+            self._manifest_files[relative_path] = pfDevTools.Manifest.hashFile(file)
+            zip_file.write(file, arcname=relative_path, compress_type=zipfile.ZIP_DEFLATED)
+
+    def _printStageTimes(self, total_time: float) -> None:
+        print('Packaging stages:')
+        for name, stage_time in self._stage_times.items():
+            print(f'   {name:<28} {stage_time:>7.3f}s')
+
+        print(f'   {"total (wall time)":<28} {total_time:>7.3f}s')
 
     def dependencies(self) -> List[str]:
         deps: List[str] = [self._config.config_filename,
@@ -176,7 +248,11 @@ class Package:
     def packagedFilename(self) -> str:
         return '%s-%s-%s.zip' % (self._config.fullPlatformName(), self._config.buildVersion(), self._today)
 
-    def run(self) -> None:
+    def _packageCore(self) -> str:
+        import zipfile
+
+        start_time = time.monotonic()
+
         # -- We delete the core build folder in case stale files are in there (for example after changing the core config file)
         if os.path.exists(self._core_folder):
             shutil.rmtree(self._core_folder)
@@ -193,23 +269,140 @@ class Package:
         platforms_image_folder = os.path.join(platforms_folder, '_images')
         os.makedirs(platforms_image_folder, exist_ok=True)
 
-        print('Reversing bitstream file...')
-        bitstream_dest = os.path.join(cores_folder, '%s.rbf_r' % self._config.platformShortName())
-        pfDevTools.Reverse([self._bitstream_file, bitstream_dest]).run()
-
-        print('Generating definitions files...')
-        self._generateDefinitionFiles(cores_folder, platforms_folder)
+        packaged_filename = os.path.abspath(os.path.join(self._destination_folder, self.packagedFilename()))
+        if os.path.exists(packaged_filename):
+            os.remove(packaged_filename)
 
-        print('Converting images...')
-        self._convertImages(cores_folder, platforms_image_folder)
+        self._stage_times = {}
+        self._manifest_files = {}
 
-        info_file = self._config.platformInfoFile()
-        if info_file is not None:
-            dest_info = os.path.join(cores_folder, 'info.txt')
-            shutil.copyfile(info_file, dest_info)
+        tasks = self._tasks(cores_folder, platforms_folder, platforms_image_folder)
 
         print('Packaging core...')
-        self._packageCore()
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(tasks)) as executor, zipfile.ZipFile(packaged_filename, 'w') as zip_file:
+                futures = [executor.submit(self._runTask, name, task) for name, task in tasks.items()]
+
+                # -- Zipping happens on this thread while the other tasks are still running.
+                for future in concurrent.futures.as_completed(futures):
+                    self._addToZip(zip_file, future.result())
+
+                # -- The manifest lets install and verify tell if an installed core matches this build without reading it all back.
+                manifest_file = os.path.join(cores_folder, 'manifest.json')
+                pfDevTools.Manifest(full_platform_name, self._config.buildVersion(), self._manifest_files).writeTo(manifest_file)
+                self._addToZip(zip_file, [manifest_file])
+        except BaseException:
+            if os.path.exists(packaged_filename):
+                os.remove(packaged_filename)
+
+            raise
+
+        self._printStageTimes(time.monotonic() - start_time)
+
+        return packaged_filename
+
+    @classmethod
+    def _importPillow(cls) -> None:
+        for module_name in ['PIL.Image', 'PIL.ImageChops', 'PIL.ImageMath']:
+            importlib.import_module(module_name)
+
+    @classmethod
+    def _initializeWorker(cls, parsed_configs: Dict) -> None:
+        # -- Workers are spawned, not forked, on macOS and Windows and from Python 3.14 so they can't rely on inheriting
+        # -- anything. They get the configs parsed while checking the catalogue and import Pillow once, before any core.
+        pfDevTools.CoreConfig._parsed_configs.update(parsed_configs)
+        Package._importPillow()
+
+    @classmethod
+    def _packageCoreInWorker(cls, config_file: str, bitstream_file: str, destination_folder: str, artifact_cache_folder: str) -> Tuple[str, float, str, str]:
+        # -- Runs in a worker process. Returns the packaged filename, how long it took, what was printed and the error, if any.
+        start_time = time.monotonic()
+        output = io.StringIO()
+        packaged_filename = None
+        error = None
+
+        with contextlib.redirect_stdout(output):
+            try:
+                package = Package([config_file, bitstream_file, destination_folder])
+                package._artifact_cache_folder = artifact_cache_folder
+
+                # -- Each core gets its own staging folder since they are all packaged at the same time.
+                package._core_folder = os.path.join(destination_folder, '_core', package._config.fullPlatformName())
+                packaged_filename = package._packageCore()
+            except Exception as e:
+                error = str(e) if len(str(e)) != 0 else type(e).__name__
+
+        return packaged_filename, time.monotonic() - start_time, output.getvalue(), error
+
+    def _writeCombinedZip(self, packaged_filenames: List[str]) -> None:
+        import zipfile
+
+        print(f'Writing combined catalogue \'{self._combined_filename}\'...')
+
+        # -- Platforms files shared by several cores are only added once.
+        added: Dict[str, int] = {}
+        with zipfile.ZipFile(self._combined_filename, 'w') as combined_zip:
+            for packaged_filename in packaged_filenames:
+                with zipfile.ZipFile(packaged_filename, 'r') as zip_file:
+                    for info in zip_file.infolist():
+                        if info.filename in added:
+                            if added[info.filename] != info.CRC:
+                                print(f'WARNING: \'{info.filename}\' in \'{packaged_filename}\' differs from the one already added, keeping the first one.')
+
+                            continue
+
+                        added[info.filename] = info.CRC
+                        combined_zip.writestr(info, zip_file.read(info.filename), compress_type=zipfile.ZIP_DEFLATED)
+
+    def _packageCatalogue(self) -> None:
+        start_time = time.monotonic()
+
+        # -- Everything is checked before starting. The parsed configs are then handed to the worker processes.
+        for config_file, bitstream_file in self._catalogue:
+            pfDevTools.CoreConfig(config_file)
+
+            if not os.path.exists(bitstream_file):
+                raise RuntimeError('File \'' + bitstream_file + '\' does not exist.')
+
+        Package._importPillow()
+
+        os.makedirs(self._destination_folder, exist_ok=True)
+
+        packaged_filenames: List[str] = []
+        errors: List[str] = []
+
+        with tempfile.TemporaryDirectory() as artifact_cache_folder:
+            nb_of_workers = min(self._nb_of_workers, len(self._catalogue))
+            print(f'Packaging {len(self._catalogue)} cores using {nb_of_workers} worker process{"es" if nb_of_workers != 1 else ""}...')
+
+            with concurrent.futures.ProcessPoolExecutor(max_workers=nb_of_workers, initializer=Package._initializeWorker, initargs=(pfDevTools.CoreConfig._parsed_configs,)) as executor:
+                futures = {executor.submit(Package._packageCoreInWorker, config_file, bitstream_file, self._destination_folder, artifact_cache_folder): config_file for config_file, bitstream_file in self._catalogue}
+
+                for future in concurrent.futures.as_completed(futures):
+                    packaged_filename, elapsed_time, output, error = future.result()
+
+                    if error is not None:
+                        print(output, end='')
+                        print(f'Error packaging \'{futures[future]}\': {error}')
+                        errors.append(futures[future])
+                        continue
+
+                    print(f'   packaged \'{os.path.basename(packaged_filename)}\' in {elapsed_time:.2f}s')
+                    packaged_filenames.append(packaged_filename)
+
+        if len(errors) != 0:
+            raise RuntimeError(f'Could not package {len(errors)} of {len(self._catalogue)} cores.')
+
+        if self._combined_filename is not None:
+            self._writeCombinedZip(sorted(packaged_filenames))
+
+        print(f'Packaged {len(packaged_filenames)} cores in {time.monotonic() - start_time:.2f}s.')
+
+    def run(self) -> None:
+        if len(self._catalogue) == 1 and self._combined_filename is None:
+            self._packageCore()
+        else:
+            self._packageCatalogue()
 
     @classmethod
     def name(cls) -> str:
@@ -219,3 +412,5 @@ class Package:
     def usage(cls) -> None:
         print('   build config_file bistream_file dest_folder')
         print('                                         - Build core according to a config_file.')
+        print('   build <config_file bistream_file ...> <catalogue=file> <combined=zip_file> <jobs=N> dest_folder')
+        print('                                         - Build several cores in parallel, optionally combining them in one zip.')
@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import os
+import pfDevTools
 
 from typing import List
 from enum import Enum
@@ -40,12 +41,19 @@ class Qfs:
         arguments = arguments[2:]
 
         self._number_of_cpus: int = 0
-        if arguments[0].startswith('cpus='):
-            value = arguments[0][5:]
-            if value == 'max':
-                self._number_of_cpus = os.cpu_count()
+        self._core_partition: str = None
+
+        while len(arguments) != 0 and '=' in arguments[0]:
+            if arguments[0].startswith('cpus='):
+                value = arguments[0][5:]
+                if value == 'max':
+                    self._number_of_cpus = pfDevTools.Resources.availableCPUs()
+                else:
+                    self._number_of_cpus = int(value)
+            elif arguments[0].startswith('partition='):
+                self._core_partition = arguments[0][10:]
             else:
-                self._number_of_cpus = int(value)
+                raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
 
             arguments = arguments[1:]
 
@@ -58,6 +66,15 @@ class Qfs:
         if self._number_of_cpus != 0:
             dest_file.write('set_global_assignment -name NUM_PARALLEL_PROCESSORS ' + str(self._number_of_cpus) + '\n')
 
+        # -- These use Quartus Prime Standard Edition's incremental compilation. The core gets its own partition, always
+        # -- compiled from source, and everything else stays in the Top partition which keeps its post-fit netlist.
+        if self._core_partition is not None:
+            dest_file.write('set_instance_assignment -name PARTITION_HIERARCHY root_partition -to | -section_id Top\n')
+            dest_file.write('set_global_assignment -name PARTITION_NETLIST_TYPE POST_FIT -section_id Top\n')
+            dest_file.write('set_global_assignment -name PARTITION_FITTER_PRESERVATION_LEVEL PLACEMENT_AND_ROUTING -section_id Top\n')
+            dest_file.write('set_instance_assignment -name PARTITION_HIERARCHY core -to "' + self._core_partition + '" -section_id core\n')
+            dest_file.write('set_global_assignment -name PARTITION_NETLIST_TYPE SOURCE -section_id core\n')
+
         for file in self._verilog_files:
             dest_file.write('set_global_assignment -name ')
 
@@ -119,5 +136,6 @@ class Qfs:
 
     @classmethod
     def usage(cls) -> None:
-        print('   qfs qsf_in qsf_out <cpus=num> files   - Add files and set number of cpu for the project.')
-        print('                                           (if num is \'max\' then all CPU cores will be used).')
+        print('   qfs qsf_in qsf_out <cpus=num> files   - Add files and set number of cpu for the project (if num is')
+        print('       <partition=path>                    \'max\' then all CPU cores will be used), optionally putting the')
+        print('                                           core at path in its own partition.')
@@ -25,22 +25,20 @@ class Reverse:
         if not os.path.exists(self._rbf_filename):
             raise RuntimeError('File \'' + self._rbf_filename + '\' does not exist.')
 
+    # -- Each byte value and its bit-reversed value, used to reverse the whole bitstream in one bytes.translate() call.
+    _reversed_bytes: bytes = bytes(int(f'{byte:08b}'[::-1], 2) for byte in range(256))
+
     def run(self) -> None:
         print('Reading \'' + self._rbf_filename + '\'.')
-        input_file = open(self._rbf_filename, 'rb')
-        input_data = input_file.read()
-        input_file.close()
+        with open(self._rbf_filename, 'rb') as input_file:
+            input_data = input_file.read()
 
-        reversed_data = []
         print('Reversing ' + str(len(input_data)) + ' bytes.')
-        for byte in input_data:
-            reversed_byte = ((byte & 1) << 7) | ((byte & 2) << 5) | ((byte & 4) << 3) | ((byte & 8) << 1) | ((byte & 16) >> 1) | ((byte & 32) >> 3) | ((byte & 64) >> 5) | ((byte & 128) >> 7)
-            reversed_data.append(reversed_byte)
+        reversed_data = input_data.translate(Reverse._reversed_bytes)
 
         print('Writing \'' + self._rbf_r_filename + '\'.')
-        output_file = open(self._rbf_r_filename, 'wb')
-        output_file.write(bytearray(reversed_data))
-        output_file.close()
+        with open(self._rbf_r_filename, 'wb') as output_file:
+            output_file.write(reversed_data)
 
     @classmethod
     def name(cls) -> str:
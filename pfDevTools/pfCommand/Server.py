@@ -0,0 +1,314 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import io
+import os
+import re
+import socket
+import shutil
+import tarfile
+import tempfile
+import threading
+import contextlib
+import socketserver
+import pfDevTools
+
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from pfDevTools.__about__ import __version__
+from pfDevTools.CompileFarm import CompileFarm
+from pfDevTools.Exceptions import ArgumentError
+
+
+# -- Classes
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request: Dict = CompileFarm.readMessage(self.rfile)
+        except ValueError:
+            return
+
+        if request is not None:
+            self.server.compile_server._handleRequest(request, self.request, self.rfile)
+
+
+class Server:
+    """A tool to run Quartus compiles sent by other machines using the remote toolchain."""
+
+    # -- Clients can only ask for these. Quartus still runs the Tcl found in the project they send, see _scriptAssignment().
+    _allowed_commands: List[str] = ['quartus_sh --flow compile pf_core']
+
+    # -- Assignments making Quartus run a Tcl script, like PRE_FLOW_SCRIPT_FILE, in the project files of a compile job.
+    _script_assignment = re.compile(r'-name\s+"?(\w*FLOW_SCRIPT_FILE|\w*TCL_SCRIPT_FILE)\b', re.IGNORECASE)
+    _project_file_extensions: List[str] = ['.qsf', '.qip', '.qpf', '.tcl']
+
+    # -- Number of successful results kept around for clients asking for the same job again.
+    _nb_of_cached_results: int = 64
+
+    def __init__(self, arguments):
+        """Constructor based on command line arguments."""
+
+        self._host: str = '127.0.0.1'
+        self._port: int = CompileFarm.default_port
+        self._nb_of_workers: int = 1
+
+        for argument in arguments:
+            try:
+                if argument.startswith('host='):
+                    self._host = argument[5:]
+                elif argument.startswith('port='):
+                    self._port = int(argument[5:])
+                elif argument.startswith('workers='):
+                    self._nb_of_workers = int(argument[8:])
+                else:
+                    raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+            except ValueError:
+                raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+
+        if self._nb_of_workers < 1:
+            raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+
+        self._token: str = CompileFarm.token()
+
+        self._toolchain: pfDevTools.Toolchain = pfDevTools.Toolchain.fromEnvironment()
+        if self._toolchain.name == 'remote':
+            raise RuntimeError('pf server needs a local toolchain to run compiles, it cannot use the remote toolchain.')
+
+        self._nb_of_cpus: int = self._toolchain.numberOfCPUs()
+        self._cpus_per_job: int = max(1, self._nb_of_cpus // self._nb_of_workers)
+
+        server_folder = os.path.join(pfDevTools.Paths.cacheFolder(), 'compile-server')
+        self._results_folder: str = os.path.join(server_folder, 'results')
+        self._jobs_folder: str = os.path.join(server_folder, 'jobs')
+
+        self._lock = threading.Lock()
+        self._workers = threading.Semaphore(self._nb_of_workers)
+        self._nb_of_busy_workers: int = 0
+        self._nb_of_queued_jobs: int = 0
+        self._job_locks: Dict[str, threading.Lock] = {}
+
+    def _status(self) -> Dict:
+        with self._lock:
+            return {'type': 'status',
+                    'protocol': CompileFarm.protocol_version,
+                    'version': __version__,
+                    'cpus': self._nb_of_cpus,
+                    'cpus_per_job': self._cpus_per_job,
+                    'workers': self._nb_of_workers,
+                    'busy': self._nb_of_busy_workers,
+                    'queued': self._nb_of_queued_jobs,
+                    'free_cpus': max(0, self._nb_of_cpus - (self._nb_of_busy_workers * self._cpus_per_job)),
+                    'free_memory': pfDevTools.Resources.availableMemory()}
+
+    def _resultFile(self, job_hash: str) -> str:
+        return os.path.join(self._results_folder, f'{job_hash}.tar.gz')
+
+    def _readCachedResult(self, job_hash: str) -> bytes:
+        try:
+            result_file = self._resultFile(job_hash)
+            with open(result_file, 'rb') as in_file:
+                result = in_file.read()
+
+            # -- Results are expired based on when they were last used.
+            os.utime(result_file)
+            return result
+        except OSError:
+            return None
+
+    def _cacheResult(self, job_hash: str, result: bytes) -> None:
+        with contextlib.suppress(OSError):
+            os.makedirs(self._results_folder, exist_ok=True)
+
+            result_file = self._resultFile(job_hash)
+            temp_file = f'{result_file}.{threading.get_ident()}'
+            with open(temp_file, 'wb') as out_file:
+                out_file.write(result)
+
+            os.replace(temp_file, result_file)
+
+            # -- Only the most recently used results are kept.
+            results = sorted(os.scandir(self._results_folder), key=lambda entry: entry.stat().st_mtime, reverse=True)
+            for entry in results[Server._nb_of_cached_results:]:
+                os.remove(entry.path)
+
+    @classmethod
+    def _scriptAssignment(cls, tarball: bytes) -> Optional[str]:
+        # -- Returns the first project file asking Quartus to run a script, if any.
+        with tarfile.open(fileobj=io.BytesIO(tarball), mode='r:') as tar_file:
+            for member in tar_file.getmembers():
+                if not member.isfile() or os.path.splitext(member.name)[1].lower() not in Server._project_file_extensions:
+                    continue
+
+                content = tar_file.extractfile(member).read().decode('utf-8', errors='replace')
+                if Server._script_assignment.search(content) is not None:
+                    return member.name
+
+        return None
+
+    def _jobLock(self, job_hash: str) -> threading.Lock:
+        # -- The same job sent twice at the same time is only compiled once.
+        with self._lock:
+            return self._job_locks.setdefault(job_hash, threading.Lock())
+
+    def _compile(self, command: str, compressed_tarball: bytes, send_log) -> Tuple[int, bytes]:
+        os.makedirs(self._jobs_folder, exist_ok=True)
+        job_folder = tempfile.mkdtemp(dir=self._jobs_folder)
+
+        try:
+            CompileFarm.unpack(compressed_tarball, job_folder)
+
+            try:
+                self._toolchain.compile(command, job_folder, scratch=os.environ.get('PF_SCRATCH', None), quiet=False, line_handler=send_log)
+                exit_code = 0
+            except SystemExit:
+                exit_code = 1
+
+            output_folder = os.path.join(job_folder, 'output_files')
+            result = CompileFarm.compress(CompileFarm.packFolder(output_folder)) if os.path.isdir(output_folder) else b''
+        finally:
+            shutil.rmtree(job_folder, ignore_errors=True)
+
+        return exit_code, result
+
+    def _handleCompile(self, request: Dict, connection: socket.socket, in_file) -> None:
+        command = request.get('command', None)
+        job_hash = request.get('hash', None)
+
+        # -- The hash is used as a filename so it has to be checked too.
+        if command not in Server._allowed_commands or not isinstance(job_hash, str) or len(job_hash) != 64 or not all(c in '0123456789abcdef' for c in job_hash):
+            CompileFarm.sendMessage(connection, {'type': 'error', 'message': f'pf server does not run \'{command}\'.'})
+            return
+
+        result = self._readCachedResult(job_hash)
+        if result is not None:
+            print(f'Job {job_hash[:12]}: sending cached results.')
+            CompileFarm.sendMessage(connection, {'type': 'result', 'exit_code': 0, 'cached': True}, result)
+            return
+
+        CompileFarm.sendMessage(connection, {'type': 'send'})
+        message = CompileFarm.readMessage(in_file)
+        if message is None or message.get('type', None) != 'source':
+            return
+
+        compressed_tarball = CompileFarm.readPayload(in_file, message)
+        tarball = CompileFarm.decompress(compressed_tarball)
+        if CompileFarm.jobHash(command, tarball) != job_hash:
+            CompileFarm.sendMessage(connection, {'type': 'error', 'message': 'Compile job does not match its hash.'})
+            return
+
+        script_file = Server._scriptAssignment(tarball)
+        if script_file is not None:
+            CompileFarm.sendMessage(connection, {'type': 'error', 'message': f'pf server does not run compiles whose project runs scripts, like \'{script_file}\' does.'})
+            return
+
+        # -- A client going away doesn't stop its compile, whose results are cached for when it asks again.
+        connected = [True]
+
+        def sendLog(line: str) -> None:
+            if connected[0]:
+                try:
+                    CompileFarm.sendMessage(connection, {'type': 'log', 'line': line})
+                except OSError:
+                    connected[0] = False
+
+        try:
+            with self._jobLock(job_hash):
+                result = self._readCachedResult(job_hash)
+                if result is not None:
+                    CompileFarm.sendMessage(connection, {'type': 'result', 'exit_code': 0, 'cached': True}, result)
+                    return
+
+                with self._lock:
+                    self._nb_of_queued_jobs += 1
+                    nb_of_jobs_ahead = self._nb_of_queued_jobs - 1 + self._nb_of_busy_workers - self._nb_of_workers
+
+                if nb_of_jobs_ahead >= 0:
+                    sendLog(f'Waiting for a free worker on {socket.gethostname()} ({nb_of_jobs_ahead + 1} jobs ahead).')
+
+                with self._workers:
+                    with self._lock:
+                        self._nb_of_queued_jobs -= 1
+                        self._nb_of_busy_workers += 1
+
+                    print(f'Job {job_hash[:12]}: compiling.')
+
+                    try:
+                        exit_code, result = self._compile(command, compressed_tarball, sendLog)
+                    finally:
+                        with self._lock:
+                            self._nb_of_busy_workers -= 1
+
+                print(f'Job {job_hash[:12]}: {"done" if exit_code == 0 else "failed"}.')
+
+                if exit_code == 0:
+                    self._cacheResult(job_hash, result)
+        except Exception as e:
+            # -- For example the toolchain not being available or the job not unpacking, the client gets the actual error.
+            error = str(e) if len(str(e)) != 0 else type(e).__name__
+            print(f'Job {job_hash[:12]}: error: {error}')
+
+            if connected[0]:
+                CompileFarm.sendMessage(connection, {'type': 'error', 'message': error})
+
+            return
+        finally:
+            with self._lock:
+                self._job_locks.pop(job_hash, None)
+
+        if connected[0]:
+            CompileFarm.sendMessage(connection, {'type': 'result', 'exit_code': exit_code}, result)
+
+    def _handleRequest(self, request: Dict, connection: socket.socket, in_file) -> None:
+        if request.get('protocol', None) != CompileFarm.protocol_version:
+            CompileFarm.sendMessage(connection, {'type': 'error', 'message': f'pf server v{__version__} cannot handle requests from this version of pf.'})
+            return
+
+        if not CompileFarm.isSigned(request, self._token):
+            CompileFarm.sendMessage(connection, {'type': 'error', 'message': f'pf server refused the request, check that {CompileFarm.token_variable} is the same on the client and the server.'})
+            return
+
+        request_type = request.get('type', None)
+
+        try:
+            if request_type == 'status':
+                CompileFarm.sendMessage(connection, self._status())
+            elif request_type == 'compile':
+                self._handleCompile(request, connection, in_file)
+            else:
+                CompileFarm.sendMessage(connection, {'type': 'error', 'message': f'Unknown pf server request \'{request_type}\'.'})
+        except (OSError, ValueError, RuntimeError, EOFError, tarfile.TarError) as e:
+            print(f'Error handling request: {str(e)}')
+
+    def run(self) -> None:
+        server = _ThreadingTCPServer((self._host, self._port), _RequestHandler)
+        server.compile_server = self
+
+        if self._host not in ('127.0.0.1', 'localhost', '::1'):
+            print(f'Warning: anyone who can reach {self._host}:{self._port} and knows {CompileFarm.token_variable} can run code on this machine.')
+
+        print(f'pf server v{__version__} listening on {self._host}:{self._port} with {self._nb_of_workers} workers of {self._cpus_per_job} CPUs each, using the {self._toolchain.name} toolchain. Press Ctrl-C to stop.')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            print('pf server stopped.')
+
+    @classmethod
+    def name(cls) -> str:
+        return 'server'
+
+    @classmethod
+    def usage(cls) -> None:
+        print('   server <host=addr> <port=N>           - Run Quartus compiles sent by the remote toolchain')
+        print('          <workers=N>                      (running up to N compiles at the same time).')
@@ -0,0 +1,179 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import time
+import pfDevTools
+import concurrent.futures
+
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from pfDevTools.Exceptions import ArgumentError
+
+
+# -- Classes
+class Verify:
+    """A tool to check that the cores installed on a volume match their packaged cores or manifests."""
+
+    def __init__(self, arguments):
+        """Constructor based on command line arguments."""
+
+        self._volume_path: str = None
+        self._nb_of_threads: int = 8
+        self._sources: List[str] = []
+
+        for argument in arguments:
+            if argument.startswith('volume='):
+                self._volume_path = argument[7:]
+            elif argument.startswith('threads='):
+                try:
+                    self._nb_of_threads = int(argument[8:])
+                except ValueError:
+                    raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+
+                if self._nb_of_threads < 1:
+                    raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+            else:
+                extension = os.path.splitext(argument)[1]
+                if extension != '.zip' and extension != '.json':
+                    raise ArgumentError('Can only verify against zipped up core files or manifest files.')
+
+                if not os.path.exists(argument):
+                    raise ArgumentError('File \'' + argument + '\' does not exist.')
+
+                self._sources.append(argument)
+
+        if self._volume_path is None:
+            self._volume_path = pfDevTools.CoreConfig.coreInstallVolumePath()
+
+        if not os.path.exists(self._volume_path):
+            raise RuntimeError(f'Volume {self._volume_path} is not mounted.')
+
+    @classmethod
+    def _isIgnored(cls, filename: str) -> bool:
+        # -- Files macOS adds to FAT volumes.
+        return filename.startswith('._') or filename == '.DS_Store'
+
+    def _readManifest(self, source: str) -> 'pfDevTools.Manifest':
+        if source.endswith('.zip'):
+            import zipfile
+
+            with zipfile.ZipFile(source, 'r') as zip_ref:
+                manifest = pfDevTools.Manifest.fromZip(zip_ref)
+        else:
+            manifest = pfDevTools.Manifest.readFrom(source)
+
+        if manifest is None:
+            raise RuntimeError(f'Cannot find a valid manifest in \'{source}\'. Maybe it was packaged by an older version of pf?')
+
+        return manifest
+
+    def _installedManifests(self) -> List['pfDevTools.Manifest']:
+        # -- Without anything to check against, each installed core is checked against its own manifest.
+        manifests: List[pfDevTools.Manifest] = []
+        cores_folder = os.path.join(self._volume_path, 'Cores')
+
+        if os.path.isdir(cores_folder):
+            for entry in sorted(os.scandir(cores_folder), key=lambda entry: entry.name):
+                if not entry.is_dir() or Verify._isIgnored(entry.name):
+                    continue
+
+                manifest = pfDevTools.Manifest.installedOn(self._volume_path, entry.name)
+                if manifest is None:
+                    print(f'Skipping \'{entry.name}\' which has no manifest.')
+                    continue
+
+                manifests.append(manifest)
+
+        return manifests
+
+    def _volumePath(self, path: str) -> str:
+        return os.path.join(self._volume_path, *path.split('/'))
+
+    def _checkFile(self, path: str, expected_hash: str, expected_size: int) -> Tuple[str, int]:
+        # -- Returns the problem found, if any, and the number of bytes read.
+        volume_path = self._volumePath(path)
+
+        try:
+            if os.path.getsize(volume_path) != expected_size:
+                return 'modified', 0
+
+            file_hash, size = pfDevTools.Manifest.hashFile(volume_path)
+        except FileNotFoundError:
+            return 'missing', 0
+
+        return (None if file_hash == expected_hash else 'modified'), size
+
+    def _extraFiles(self, manifest: 'pfDevTools.Manifest') -> List[str]:
+        # -- Platforms files can be shared with other cores so only the core's own folder is checked for extra files.
+        extra_files: List[str] = []
+        core_folder = f'Cores/{manifest.core_name}'
+        manifest_path = pfDevTools.Manifest.manifestPath(manifest.core_name)
+
+        for root, dirs, filenames in os.walk(self._volumePath(core_folder)):
+            for filename in filenames:
+                if Verify._isIgnored(filename):
+                    continue
+
+                relative_path = os.path.relpath(os.path.join(root, filename), self._volume_path).replace(os.sep, '/')
+                if relative_path != manifest_path and relative_path not in manifest.files:
+                    extra_files.append(relative_path)
+
+        return extra_files
+
+    def run(self) -> None:
+        if len(self._sources) != 0:
+            manifests = [self._readManifest(source) for source in self._sources]
+        else:
+            manifests = self._installedManifests()
+
+        if len(manifests) == 0:
+            raise RuntimeError(f'No cores to verify on volume {self._volume_path}.')
+
+        start_time = time.monotonic()
+        nb_of_files = 0
+        nb_of_bytes = 0
+        problems: Dict[str, List[Tuple[str, str]]] = {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._nb_of_threads) as executor:
+            for manifest in manifests:
+                print(f'Verifying \'{manifest.core_name}\' version {manifest.version}...')
+
+                results = executor.map(lambda item: self._checkFile(item[0], item[1][0], item[1][1]), manifest.files.items())
+
+                core_problems: List[Tuple[str, str]] = []
+                for path, (problem, size) in zip(manifest.files.keys(), results):
+                    nb_of_files += 1
+                    nb_of_bytes += size
+
+                    if problem is not None:
+                        core_problems.append((problem, path))
+
+                core_problems += [('extra', path) for path in self._extraFiles(manifest)]
+
+                for problem, path in core_problems:
+                    print(f'   {problem:<9} {path}')
+
+                problems[manifest.core_name] = core_problems
+
+        elapsed_time = time.monotonic() - start_time
+        throughput = nb_of_bytes / elapsed_time / (1024 * 1024) if elapsed_time > 0 else 0.0
+        print(f'Checked {nb_of_files} files, hashing {nb_of_bytes / (1024 * 1024):.1f} MiB in {elapsed_time:.2f}s ({throughput:.1f} MiB/s).')
+
+        bad_cores = [core_name for core_name, core_problems in problems.items() if len(core_problems) != 0]
+        if len(bad_cores) != 0:
+            raise RuntimeError(f'Found problems with {", ".join(bad_cores)}.')
+
+        print('All cores match.')
+
+    @classmethod
+    def name(cls) -> str:
+        return 'verify'
+
+    @classmethod
+    def usage(cls) -> None:
+        print('   verify <files> <volume=path>          - Check installed cores against zip or manifest files (or their own')
+        print('          <threads=N>                      manifests if no files are given).')
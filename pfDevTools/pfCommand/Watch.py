@@ -0,0 +1,210 @@
+# SPDX-FileCopyrightText: 2023-present Didier Malenfant
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import sys
+import signal
+import subprocess
+import pfDevTools
+
+from enum import IntEnum
+from typing import List
+from typing import Set
+from pathlib import Path
+
+from pfDevTools.Exceptions import ArgumentError
+from pfDevTools.OpenFPGACore import OpenFPGACore
+
+
+# -- Classes
+class Stage(IntEnum):
+    NONE = 0
+    PACKAGE = 1
+    COMPILE = 2
+
+
+class Watch:
+    """A tool to rebuild the local project whenever its sources or assets change."""
+
+    def __init__(self, arguments):
+        """Constructor based on command line arguments."""
+
+        self._install: bool = False
+        self._volume_path: str = None
+        self._debounce_time: float = 0.5
+
+        if len(arguments) == 0:
+            raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+
+        self._config_file: str = arguments[0]
+        if not os.path.exists(self._config_file):
+            raise ArgumentError('Config file \'' + self._config_file + '\' does not exist.')
+
+        for argument in arguments[1:]:
+            if argument == 'install':
+                self._install = True
+            elif argument.startswith('install='):
+                self._install = True
+                self._volume_path = argument[8:]
+            else:
+                raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
+
+        if self._install and self._volume_path is None:
+            self._volume_path = pfDevTools.CoreConfig.coreInstallVolumePath()
+
+        # -- These mirror the defaults used by pfDevTools.SConsEnvironment().OpenFPGACore().
+        self._src_folder: str = str(Path(self._config_file).parent)
+        self._build_folder: str = os.environ.get('PF_BUILD_FOLDER', '_build')
+
+        self._process: subprocess.Popen = None
+        self._current_stage: Stage = Stage.NONE
+        self._remaining_steps: List[List[str]] = []
+
+    def _assetFiles(self) -> List[str]:
+        files: List[str] = [self._config_file]
+
+        try:
+            config = pfDevTools.CoreConfig(self._config_file)
+            files += [config.platformImage(), config.authorIcon()]
+
+            info_file = config.platformInfoFile()
+            if info_file is not None:
+                files.append(info_file)
+        except Exception as e:
+            print(f'Error reading config file: {str(e)}')
+
+        return files
+
+    def _stageFor(self, changes: Set[str]) -> Stage:
+        for path in changes:
+            if path.endswith('.v') or path.endswith('.sv'):
+                return Stage.COMPILE
+
+        return Stage.PACKAGE
+
+    def _pfCommand(self, arguments: List[str]) -> List[str]:
+        return [sys.executable, '-m', 'pfDevTools.pfCommand.__main__'] + arguments
+
+    def _stepsFor(self, stage: Stage) -> List[List[str]]:
+        steps: List[List[str]] = []
+
+        bitstream_file = OpenFPGACore.bitstreamFile(self._build_folder)
+        if stage == Stage.COMPILE or not os.path.exists(bitstream_file):
+            steps.append(self._pfCommand(['make']))
+        else:
+            # -- Only assets changed so we repackage the existing bitstream without going through the whole build.
+            steps.append(self._pfCommand(['build', self._config_file, bitstream_file, self._build_folder]))
+
+        if self._install:
+            steps.append(['install'])
+
+        return steps
+
+    def _startNextStep(self) -> None:
+        step = self._remaining_steps.pop(0)
+
+        if step == ['install']:
+            # -- The packaged filename depends on the config file and today's date so we only resolve it now.
+            build_process = pfDevTools.Package([self._config_file, OpenFPGACore.bitstreamFile(self._build_folder), self._build_folder])
+            packaged_core = os.path.join(self._build_folder, build_process.packagedFilename())
+            step = self._pfCommand(['install', packaged_core, self._volume_path])
+
+        self._process = subprocess.Popen(step, start_new_session=(os.name == 'posix'))
+
+    def _cancelBuild(self) -> None:
+        if self._process is None:
+            return
+
+        print('Cancelling current build...')
+
+        # -- The whole process group goes so that scons and any tool it started go too.
+        try:
+            if os.name == 'posix':
+                os.killpg(self._process.pid, signal.SIGTERM)
+            else:
+                self._process.terminate()
+
+            self._process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        except ProcessLookupError:
+            pass
+
+        self._process = None
+
+    def _startBuild(self, stage: Stage) -> None:
+        # -- A cancelled build has to redo the work it didn't get to finish.
+        if self._process is not None:
+            self._cancelBuild()
+            stage = max(stage, self._current_stage)
+
+        self._current_stage = stage
+        self._remaining_steps = self._stepsFor(stage)
+
+        print('')
+        print('Recompiling core...' if stage == Stage.COMPILE else 'Repackaging core...')
+        self._startNextStep()
+
+    def _checkBuild(self) -> None:
+        if self._process is None:
+            return
+
+        result = self._process.poll()
+        if result is None:
+            return
+
+        self._process = None
+
+        if result != 0:
+            print('Build failed, waiting for changes.')
+        elif len(self._remaining_steps) != 0:
+            self._startNextStep()
+            return
+        else:
+            print('Build done, waiting for changes.')
+
+        self._current_stage = Stage.NONE
+        self._remaining_steps = []
+
+    def run(self) -> None:
+        watcher = pfDevTools.FileWatcher([self._src_folder], ['.v', '.sv'], self._assetFiles(), excluded_folders=[self._build_folder])
+
+        print(f'Watching \'{self._src_folder}\' for changes using {"inotify" if watcher.usesInotify() else "polling"}. Press Ctrl-C to stop.')
+
+        try:
+            self._startBuild(Stage.COMPILE)
+
+            while True:
+                changes = watcher.waitForChanges(timeout=0.25)
+                self._checkBuild()
+
+                if len(changes) == 0:
+                    continue
+
+                # -- Editors often write files in several steps so we wait for things to settle down before building.
+                while True:
+                    more_changes = watcher.waitForChanges(timeout=self._debounce_time)
+                    if len(more_changes) == 0:
+                        break
+
+                    changes |= more_changes
+
+                if os.path.abspath(self._config_file) in changes:
+                    watcher.setFiles(self._assetFiles())
+
+                self._startBuild(self._stageFor(changes))
+        except KeyboardInterrupt:
+            self._cancelBuild()
+        finally:
+            watcher.close()
+
+    @classmethod
+    def name(cls) -> str:
+        return 'watch'
+
+    @classmethod
+    def usage(cls) -> None:
+        print('   watch config_file <install=volume>    - Rebuild the local project when its sources or assets change.')
+        print('                                           (optionally installing the core on volume after each build).')
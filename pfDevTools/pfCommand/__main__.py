@@ -5,6 +5,7 @@
 import sys
 import traceback
 
+from .Daemon import Daemon
 from .pfCommand import pfCommand
 from pfDevTools.Exceptions import ArgumentError
 
@@ -16,6 +17,11 @@ def main():
     global _debug_on
 
     try:
+        # -- If a pf daemon is running, it runs the command for us in an already warmed up process.
+        exit_code = Daemon.forward(sys.argv[1:])
+        if exit_code is not None:
+            sys.exit(exit_code)
+
         if '--debug' in sys.argv:
             print('Enabling debugging information.')
             _debug_on = True
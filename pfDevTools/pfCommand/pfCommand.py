@@ -4,46 +4,66 @@
 
 import os
 import sys
+import json
 import getopt
+import importlib
+import subprocess
 import pfDevTools.Utils
 import pfDevTools.Git
+import pfDevTools.Profiler
 
-from semver import Version
+from typing import Dict
 from pathlib import Path
 
 from pfDevTools.__about__ import __version__
 from pfDevTools.Exceptions import ArgumentError
 
-from .Clean import Clean
-from .Clone import Clone
-from .Convert import Convert
-from .Delete import Delete
-from .DryRun import DryRun
-from .Eject import Eject
-from .Install import Install
-from .Make import Make
-from .Package import Package
-from .Qfs import Qfs
-from .Reverse import Reverse
-
 
 # -- Classes
 class pfCommand:
     """The pf command line tool for Project Freedom."""
 
+    # -- Command names and the class implementing them. Each command module is only imported when it is needed.
+    _commands: Dict[str, str] = {'clean': 'Clean',
+                                 'clone': 'Clone',
+                                 'convert': 'Convert',
+                                 'daemon': 'Daemon',
+                                 'delete': 'Delete',
+                                 'dryrun': 'DryRun',
+                                 'eject': 'Eject',
+                                 'install': 'Install',
+                                 'list': 'ListCores',
+                                 'make': 'Make',
+                                 'makeall': 'MakeAll',
+                                 'build': 'Package',
+                                 'qfs': 'Qfs',
+                                 'reverse': 'Reverse',
+                                 'server': 'Server',
+                                 'verify': 'Verify',
+                                 'watch': 'Watch'}
+
+    _update_check_started: bool = False
+    _update_check_timeout_in_seconds: float = 10.0
+
     def __init__(self, args):
         """Constructor based on command line arguments."""
 
         try:
-            self._commands = [Clean, Clone, Convert, Delete, DryRun, Eject, Install, Make, Package, Qfs, Reverse]
+            self._profile: bool = False
+            self._trace_file: str = None
 
             # -- Gather the arguments
-            opts, arguments = getopt.getopt(args, 'dhv', ['debug', 'help', 'version'])
+            opts, arguments = getopt.getopt(args, 'dhvp', ['debug', 'help', 'version', 'profile', 'trace='])
 
             for o, a in opts:
                 if o in ('-d', '--debug'):
                     # -- We ignore this argument because it was already dealt with in the calling main() code.
                     continue
+                elif o in ('-p', '--profile'):
+                    self._profile = True
+                elif o == '--trace':
+                    self._profile = True
+                    self._trace_file = a
                 elif o in ('-h', '--help'):
                     self.printUsage()
                     sys.exit(0)
@@ -54,15 +74,10 @@ class pfCommand:
             if len(arguments) == 0:
                 raise ArgumentError('Invalid arguments. Maybe start with `pf --help?')
 
-            self._command_found = None
-            for command in self._commands:
-                if command.name() == arguments[0]:
-                    self._command_found = command
-                    break
-
-            if self._command_found is None:
+            if arguments[0] not in pfCommand._commands:
                 raise ArgumentError(f'Unknown command \'{arguments[0]}\'. Maybe start with `pf --help?')
 
+            self._command_found = pfCommand._commandClass(arguments[0])
             self._arguments = arguments[1:]
 
         except getopt.GetoptError:
@@ -70,7 +85,17 @@ class pfCommand:
             sys.exit(0)
 
     def main(self) -> None:
-        self._command_found(self._arguments).run()
+        # -- The update check runs in the background, and keeps running after the command if it needs to.
+        pfCommand.startUpdateCheck()
+
+        if self._profile:
+            pfDevTools.Profiler.start()
+
+        try:
+            with pfDevTools.Profiler.span('pf ' + self._command_found.name(), 'command'):
+                self._command_found(self._arguments).run()
+        finally:
+            pfDevTools.Profiler.finish(self._trace_file)
 
         pfCommand.checkForUpdates()
 
@@ -84,14 +109,21 @@ class pfCommand:
         print('   --help/-h                             - Show a help message.')
         print('   --version/-v                          - Display the app\'s version.')
         print('   --debug/-d                            - Enable extra debugging information.')
+        print('   --profile/-p                          - Print how long each build phase and subprocess took.')
+        print('   --trace=trace_file                    - Same as --profile but also write a Chrome trace-event file.')
         print('')
         print('Supported commands are:')
 
-        for command in self._commands:
-            command.usage()
+        for command_name in pfCommand._commands.keys():
+            pfCommand._commandClass(command_name).usage()
 
         print('')
 
+    @classmethod
+    def _commandClass(cls, command_name: str):
+        class_name = pfCommand._commands[command_name]
+        return getattr(importlib.import_module(f'pfDevTools.pfCommand.{class_name}'), class_name)
+
     @classmethod
     def printVersion(cls) -> None:
         print('👾 pf-dev-tools v' + __version__ + ' 👾')
@@ -99,24 +131,78 @@ class pfCommand:
         pfCommand.checkForUpdates()
 
     @classmethod
-    def checkForUpdates(cls, force_check=False):
+    def _updateCheckIsDisabled(cls) -> bool:
+        return os.environ.get('PF_NO_UPDATE_CHECK', None) is not None
+
+    @classmethod
+    def _readUpdateCheckFile(cls) -> str:
         try:
-            file_path = pfDevTools.Paths.appUpdateCheckFile()
-            if not force_check and not pfDevTools.Utils.fileOlderThan(file_path, time_in_seconds=(24 * 60 * 60)):
-                return
+            with open(pfDevTools.Paths.appUpdateCheckFile(), 'r') as in_file:
+                return json.load(in_file).get('latest_version', None)
+        except (OSError, ValueError, AttributeError):
+            return None
 
-            latest_version = pfDevTools.Git('github.com/DidierMalenfant/pfDevTools').getLatestVersion()
-            if latest_version is None:
+    @classmethod
+    def _writeUpdateCheckFile(cls, latest_version: str) -> None:
+        file_path = pfDevTools.Paths.appUpdateCheckFile()
+        os.makedirs(Path(file_path).parent, exist_ok=True)
+
+        temp_file = f'{file_path}.{os.getpid()}'
+        with open(temp_file, 'w') as out_file:
+            json.dump({'latest_version': latest_version}, out_file)
+
+        os.replace(temp_file, file_path)
+
+    @classmethod
+    def _fetchLatestVersion(cls) -> None:
+        try:
+            latest_version = pfDevTools.Git('github.com/DidierMalenfant/pfDevTools', timeout_in_seconds=pfCommand._update_check_timeout_in_seconds).getLatestVersion()
+            if latest_version is not None:
+                pfCommand._writeUpdateCheckFile(str(latest_version))
+        except Exception:
+            pass
+
+    @classmethod
+    def startUpdateCheck(cls, force_check=False) -> None:
+        if pfCommand._update_check_started or pfCommand._updateCheckIsDisabled():
+            return
+
+        pfCommand._update_check_started = True
+
+        try:
+            attempt_file = pfDevTools.Paths.appUpdateAttemptFile()
+            if not force_check and not pfDevTools.Utils.fileOlderThan(attempt_file, time_in_seconds=(24 * 60 * 60)):
                 return
 
-            os.makedirs(Path(file_path).parent, exist_ok=True)
+            # -- Attempts are recorded apart from the cached version, which is only written when a check succeeds, so that
+            # -- machines without network access keep showing the last version found but only try once a day.
+            os.makedirs(Path(attempt_file).parent, exist_ok=True)
+            with open(attempt_file, 'w'):
+                pass
+
+            # -- The check runs in its own detached process so that no command ever waits for the network, and gives up
+            # -- after a while if it cannot reach it.
+            subprocess.Popen([sys.executable, '-c', 'from pfDevTools.pfCommand.pfCommand import pfCommand; pfCommand._fetchLatestVersion()'],
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=(os.name == 'posix'))
+        except Exception:
+            pass
+
+    @classmethod
+    def checkForUpdates(cls, force_check=False):
+        if pfCommand._updateCheckIsDisabled():
+            return
 
-            if os.path.exists(file_path):
-                os.remove(file_path)
+        try:
+            pfCommand.startUpdateCheck(force_check)
+
+            # -- A check started by this command is never waited for, its result is shown by the next one.
+            latest_version = pfCommand._readUpdateCheckFile()
+            if latest_version is None:
+                return
 
-            with open(file_path, 'w') as out_file:
-                out_file.write('check')
+            from semver import Version
 
+            latest_version = Version.parse(latest_version)
             if latest_version > Version.parse(__version__):
                 warning = '‼️' if sys.platform == "darwin" else '!!'
                 print(f'{warning}  Version v{str(latest_version)} is available for pf-dev-tools. You have v{__version__} {warning}')